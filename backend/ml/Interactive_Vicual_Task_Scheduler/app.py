@@ -1,3 +1,6 @@
+# Deprecated: ml_services/main.py serves this contract at /legacy/task-scheduler on the shared
+# model instance (parity: ml_services/benchmarks/check_legacy_parity.py).
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 import joblib
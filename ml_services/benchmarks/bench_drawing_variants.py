@@ -0,0 +1,163 @@
+# benchmarks/bench_drawing_variants.py
+"""
+Compare drawing model variants (shipped / float16 / int8) by accuracy and
+CPU latency, across thread counts and with or without XNNPACK.
+
+Run from ml_services/:
+    python -m benchmarks.bench_drawing_variants --data-dir data/drawings/val
+    python -m benchmarks.bench_drawing_variants --threads 1,2,4 --out variants.json
+
+--data-dir is the validation set, with one sub-folder per label from
+gemified/class_labels.json (e.g. val/a.apple/*.png). Without it,
+synthetic drawings are used: there is no accuracy then, only top-1
+agreement with the shipped model.
+
+Every gemified/chromabloom_model*.tflite is compared unless --models is
+given. Latency is the median of single-image and --batch-size invokes on
+a PooledInterpreter, i.e. what the service runs. The recommendation is
+the fastest single-image setting whose accuracy (or agreement) is within
+--max-drop points of the shipped model's, printed as the env settings
+that select it.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.bench_preprocess import make_drawing
+from services.interpreter_pool import PooledInterpreter
+from services.tflite_drawing_service import TFLiteDrawingService, preprocess_image
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_DIR = BASE_DIR / "gemified"
+SHIPPED_MODEL = MODEL_DIR / "chromabloom_model.tflite"
+LABELS_PATH = MODEL_DIR / "class_labels.json"
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+
+
+def load_validation(data_dir: Optional[Path], labels: List[str], limit: int, img_size) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Preprocessed images [N,H,W,3] and their label indices (None for synthetic data)."""
+    if data_dir is None:
+        images = [make_drawing(640, 480, "PNG", seed=i) for i in range(min(limit, 64))]
+        return np.concatenate([preprocess_image(b, img_size) for b in images]), None
+
+    index = {label: i for i, label in enumerate(labels)}
+    unknown = [d.name for d in data_dir.iterdir() if d.is_dir() and d.name not in index]
+    if unknown:
+        sys.exit(f"❌ Folders that are not labels in {LABELS_PATH.name}: {unknown}")
+
+    paths, y = [], []
+    for d in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        for p in sorted(d.iterdir()):
+            if p.suffix.lower() in IMAGE_SUFFIXES:
+                paths.append(p)
+                y.append(index[d.name])
+    if not paths:
+        sys.exit(f"❌ No images under {data_dir}")
+    if len(paths) > limit:
+        keep = np.sort(np.random.default_rng(0).choice(len(paths), limit, replace=False))
+        paths, y = [paths[i] for i in keep], [y[i] for i in keep]
+    return np.concatenate([preprocess_image(p.read_bytes(), img_size) for p in paths]), np.asarray(y)
+
+
+def predict_all(interp: PooledInterpreter, X: np.ndarray, batch_size: int) -> np.ndarray:
+    return np.concatenate([interp.invoke(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+
+def median_ms(interp: PooledInterpreter, x: np.ndarray, repeat: int) -> float:
+    interp.invoke(x)  # resize + delegate setup outside the timing
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        interp.invoke(x)
+        times.append((time.perf_counter() - t0) * 1e3)
+    return statistics.median(times)
+
+
+def variant_name(path: Path) -> str:
+    return path.stem.replace("chromabloom_model", "").lstrip("_") or "shipped"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", help="validation set: one folder per label")
+    parser.add_argument("--models", help="comma-separated .tflite files (default: gemified/chromabloom_model*.tflite)")
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--xnnpack", default="on,off")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=2000, help="max validation images")
+    parser.add_argument("--max-drop", type=float, default=1.0, help="accuracy points a variant may lose")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    img_size = (224, 224)
+    labels = TFLiteDrawingService._load_labels(LABELS_PATH)
+    models = [Path(m) for m in args.models.split(",")] if args.models else sorted(MODEL_DIR.glob("chromabloom_model*.tflite"))
+    models.sort(key=lambda p: p != SHIPPED_MODEL)  # the reference comes first
+    X, y = load_validation(Path(args.data_dir) if args.data_dir else None, labels, args.limit, img_size)
+    print(f"{len(X)} {'validation' if y is not None else 'synthetic'} images, {len(models)} models\n")
+
+    reference: Optional[np.ndarray] = None
+    results: List[Dict] = []
+    for path in models:
+        for xnnpack in (v.strip() == "on" for v in args.xnnpack.split(",")):
+            # Accuracy doesn't depend on the thread count; measured once per model / delegate
+            preds = predict_all(PooledInterpreter(path, num_threads=1, xnnpack=xnnpack), X, args.batch_size)
+            top1 = preds.argmax(axis=1)
+            if reference is None:
+                reference = top1
+            quality = {
+                "agreement": round(float((top1 == reference).mean() * 100), 2),
+                "top1_acc": round(float((top1 == y).mean() * 100), 2) if y is not None else None,
+                "top3_acc": round(float((np.argsort(-preds, axis=1, kind="stable")[:, :3] == y[:, None]).any(axis=1).mean() * 100), 2)
+                if y is not None else None,
+            }
+            for threads in (int(t) for t in args.threads.split(",")):
+                interp = PooledInterpreter(path, num_threads=threads, xnnpack=xnnpack)
+                single = median_ms(interp, X[:1], args.repeat)
+                batch = median_ms(interp, X[:args.batch_size], args.repeat)
+                results.append({
+                    "variant": variant_name(path),
+                    "model": str(path),
+                    "size_mb": round(path.stat().st_size / 1e6, 2),
+                    "xnnpack": xnnpack,
+                    "threads": threads,
+                    "single_ms": round(single, 2),
+                    "batch_ms_per_image": round(batch / min(args.batch_size, len(X)), 2),
+                    **quality,
+                })
+
+    print(f"{'variant':<10}{'MB':>6}{'xnnpack':>8}{'thr':>4}{'1 img ms':>10}{'batch ms/img':>13}{'top1 %':>8}{'top3 %':>8}{'agree %':>8}")
+    for r in results:
+        acc1 = f"{r['top1_acc']:.1f}" if r["top1_acc"] is not None else "-"
+        acc3 = f"{r['top3_acc']:.1f}" if r["top3_acc"] is not None else "-"
+        print(
+            f"{r['variant']:<10}{r['size_mb']:>6.2f}{'on' if r['xnnpack'] else 'off':>8}{r['threads']:>4}"
+            f"{r['single_ms']:>10.2f}{r['batch_ms_per_image']:>13.2f}{acc1:>8}{acc3:>8}{r['agreement']:>8.1f}"
+        )
+
+    metric = "top1_acc" if y is not None else "agreement"
+    baseline = results[0][metric]
+    eligible = [r for r in results if r[metric] >= baseline - args.max_drop]
+    best = min(eligible, key=lambda r: r["single_ms"])
+    variant = "" if best["variant"] == "shipped" else best["variant"]
+    print(
+        f"\nRecommended: DRAWING_MODEL_VARIANT={variant} DRAWING_NUM_THREADS={best['threads']} "
+        f"DRAWING_XNNPACK={int(best['xnnpack'])} ({best['single_ms']:.2f} ms, {metric} {best[metric]:.1f}%)"
+    )
+    if y is None:
+        print("Synthetic drawings only: rerun with --data-dir before switching models.")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"images": len(X), "metric": metric, "results": results, "recommended": best}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# benchmarks/bench_prefork.py
+"""
+Memory of N independent workers vs N pre-forked workers (serve_prefork.py).
+
+Run from ml_services/:
+    python -m benchmarks.bench_prefork --workers 4 --out prefork.json
+
+independent  N processes that each import the app and load every model,
+             like `uvicorn main:app --workers N`
+prefork      one parent loads every model, then forks N workers
+
+In both modes every worker then runs a few predictions through each model,
+so the pages a serving worker really touches are counted. Memory comes
+from /proc/<pid>/smaps_rollup (Linux only):
+  PSS  shared pages are split between the processes that map them, so the
+       sum over all processes is the real total
+  USS  pages private to one process, i.e. the cost of one more worker
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def exercise(server):
+    """A few batched predictions per model, as a serving worker would run."""
+    registry = server.registry
+    for _ in range(3):
+        cognitive = registry.get("cognitive")
+        cognitive.predict_batch(cognitive.sample_inputs(8), top_k=3, explain="sync")
+        drawing = registry.get("drawing")
+        drawing.predict_topk_batch(drawing.sample_inputs(4))
+        routine = registry.get("routine")
+        routine.predict_next_level_batch(routine.sample_inputs(8))
+        stress = registry.get("stress")
+        stress.predict_batch(stress.sample_inputs(8))
+
+
+# -------------------------------
+# Roles (run in subprocesses)
+# -------------------------------
+
+def run_independent_worker():
+    import main as server
+
+    server.registry.load_all()
+    exercise(server)
+    print(json.dumps({"pids": [os.getpid()]}), flush=True)
+    sys.stdin.read()  # hold the memory until the benchmark closes stdin
+
+
+def run_prefork_parent(workers: int):
+    import serve_prefork
+
+    server = serve_prefork.load_models()
+    ready_r, ready_w = os.pipe()
+
+    def worker():
+        exercise(server)
+        os.write(ready_w, b".")
+        signal.pause()  # until the parent's SIGTERM
+
+    pids = [serve_prefork.fork_worker(worker) for _ in range(workers)]
+    for _ in range(workers):
+        os.read(ready_r, 1)
+    print(json.dumps({"pids": [os.getpid(), *pids]}), flush=True)
+    sys.stdin.read()
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+
+# -------------------------------
+# Driver
+# -------------------------------
+
+def _spawn(args: List[str]) -> subprocess.Popen:
+    env = {**os.environ, "OMP_NUM_THREADS": "1", "MODEL_LOADING": "lazy"}
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_prefork", *args],
+        cwd=BASE_DIR,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=log,  # TensorFlow is noisy; shown only on failure
+        text=True,
+    )
+    proc.log = log
+    return proc
+
+
+def _measure(procs: List[subprocess.Popen], mode: str, workers: int) -> Dict:
+    t0 = time.perf_counter()
+    pids: List[int] = []
+    for p in procs:
+        line = p.stdout.readline()
+        if not line:
+            p.wait()
+            p.log.seek(0)
+            tail = p.log.read().decode(errors="replace")[-2000:]
+            raise RuntimeError(f"❌ {mode} process {p.pid} exited ({p.returncode}) before it was ready:\n{tail}")
+        pids += json.loads(line)["pids"]
+    ready_s = time.perf_counter() - t0
+
+    per_process = {pid: memory_kb(pid) for pid in pids}
+    for p in procs:
+        p.stdin.close()
+        p.wait(timeout=60)
+
+    worker_pids = pids if mode == "independent" else pids[1:]
+    total = {k: sum(m[k] for m in per_process.values()) for k in ("rss", "pss", "uss")}
+    return {
+        "mode": mode,
+        "workers": workers,
+        "processes": len(pids),
+        "ready_s": round(ready_s, 2),
+        "total_pss_mb": round(total["pss"] / 1024, 1),
+        "total_rss_mb": round(total["rss"] / 1024, 1),
+        "worker_uss_mb": round(sum(per_process[p]["uss"] for p in worker_pids) / len(worker_pids) / 1024, 1),
+        "parent_pss_mb": round(per_process[pids[0]]["pss"] / 1024, 1) if mode == "prefork" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--role", choices=("independent", "prefork"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "independent":
+        return run_independent_worker()
+    if args.role == "prefork":
+        return run_prefork_parent(args.workers)
+
+    results = [
+        _measure([_spawn(["--role", "independent"]) for _ in range(args.workers)], "independent", args.workers),
+        _measure([_spawn(["--role", "prefork", "--workers", str(args.workers)])], "prefork", args.workers),
+    ]
+
+    print(f"{'mode':<13}{'procs':>6}{'total PSS MB':>14}{'total RSS MB':>14}{'USS/worker MB':>15}{'ready s':>9}")
+    for r in results:
+        print(
+            f"{r['mode']:<13}{r['processes']:>6}{r['total_pss_mb']:>14.1f}{r['total_rss_mb']:>14.1f}"
+            f"{r['worker_uss_mb']:>15.1f}{r['ready_s']:>9.1f}"
+        )
+    independent, prefork = results
+    saved = independent["total_pss_mb"] - prefork["total_pss_mb"]
+    print(
+        f"\nprefork saves {saved:.0f} MB ({saved / independent['total_pss_mb']:.0%}) with {args.workers} workers; "
+        f"each extra worker costs ~{prefork['worker_uss_mb']:.0f} MB instead of ~{independent['worker_uss_mb']:.0f} MB"
+    )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "saved_mb": round(saved, 1)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
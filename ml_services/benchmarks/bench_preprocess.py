@@ -0,0 +1,84 @@
+# benchmarks/bench_preprocess.py
+"""
+Compare the exact and fast drawing preprocessing paths.
+
+Run from ml_services/:
+    python -m benchmarks.bench_preprocess --repeat 20
+
+Generates synthetic phone-sized drawings (JPEG and PNG), times both
+TFLiteDrawingService preprocessing modes, and reports the max absolute
+pixel difference and top-1 agreement between them.
+"""
+import argparse
+import io
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from services.tflite_drawing_service import TFLiteDrawingService
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = BASE_DIR / "gemified" / "chromabloom_model.tflite"
+LABELS_PATH = BASE_DIR / "gemified" / "class_labels.json"
+
+
+def make_drawing(width: int, height: int, fmt: str, seed: int = 0) -> bytes:
+    # White page with random coloured strokes, roughly like a crayon drawing
+    rng = np.random.default_rng(seed)
+    im = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(im)
+    for _ in range(40):
+        pts = [tuple(int(v) for v in p) for p in rng.integers(0, [width, height], size=(6, 2))]
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        draw.line(pts, fill=color, width=max(4, width // 150))
+
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        im.save(buf, fmt, quality=90)
+    else:
+        im.save(buf, fmt)
+    return buf.getvalue()
+
+
+def time_fn(fn, data: bytes, repeat: int):
+    fn(data)  # warm up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(data)
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(times), min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", default="4000x3000,1920x1080,640x480")
+    args = parser.parse_args()
+
+    exact = TFLiteDrawingService(MODEL_PATH, LABELS_PATH, pool_size=1, preprocess_mode="exact")
+    fast = TFLiteDrawingService(MODEL_PATH, LABELS_PATH, pool_size=1, preprocess_mode="fast")
+
+    print(f"{'image':<18}{'exact ms':>10}{'fast ms':>10}{'speedup':>9}{'max |diff|':>12}{'top1 same':>11}")
+    for size in args.sizes.split(","):
+        w, h = (int(v) for v in size.split("x"))
+        for fmt in ("JPEG", "PNG"):
+            data = make_drawing(w, h, fmt)
+
+            exact_med, _ = time_fn(exact.preprocess_image, data, args.repeat)
+            fast_med, _ = time_fn(fast.preprocess_image_fast, data, args.repeat)
+
+            x_exact = exact.preprocess_image(data)
+            x_fast = fast.preprocess_image_fast(data).copy()
+            diff = float(np.max(np.abs(x_exact - x_fast)))
+            same = exact.predict_topk(data, k=1)["top1"]["label"] == fast.predict_topk(data, k=1)["top1"]["label"]
+
+            name = f"{size} {fmt}"
+            print(f"{name:<18}{exact_med:>10.2f}{fast_med:>10.2f}{exact_med / fast_med:>8.1f}x{diff:>12.4f}{str(same):>11}")
+
+
+if __name__ == "__main__":
+    main()
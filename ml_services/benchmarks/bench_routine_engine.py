@@ -0,0 +1,85 @@
+# benchmarks/bench_routine_engine.py
+"""
+Check the compiled routine trees against LightGBM and time both engines.
+
+Run from ml_services/:
+    python -m benchmarks.bench_routine_engine --rows 20000
+
+Parity is checked on random rows plus rows that sit exactly on the split
+thresholds (including NaNs); the exit code is 1 if any predicted class
+differs or probabilities differ by more than the service's PARITY_ATOL.
+Then the per-call latency of both engines is reported by batch size.
+The same parity check runs in tests/test_routine_engine.py.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from services.routine_difficulty_service import RoutineDifficultyService
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ROUTINE_DIR = BASE_DIR / "interactive_visual_task_scheduler"
+
+
+def parity_rows(compiled, n: int, n_levels: int, seed: int = 0) -> np.ndarray:
+    """n encoded rows; the level column (5) takes every one of the n_levels encoder classes."""
+    rng = np.random.default_rng(seed)
+    splits = compiled.threshold[np.isfinite(compiled.threshold)]
+    shape = (n, compiled.n_features)
+    X = rng.uniform(splits.min() - 1.0, splits.max() + 1.0, size=shape)
+    # A quarter exactly on split thresholds, a quarter just next to them
+    q = n // 4
+    X[:q] = rng.choice(splits, size=(q, shape[1]))
+    X[q:2 * q] = rng.choice(splits, size=(q, shape[1])) + rng.normal(scale=1e-6, size=(q, shape[1]))
+    X[:, 5] = rng.integers(0, n_levels, size=n)
+    X[rng.random(size=shape) < 0.01] = np.nan
+    return X
+
+
+def time_call(fn, X, repeat: int) -> float:
+    fn(X)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(X)
+        times.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch-sizes", default="1,4,8,16,32,64,256")
+    args = parser.parse_args()
+
+    svc = RoutineDifficultyService(ROUTINE_DIR, engine="numpy")
+    if svc.compiled is None:
+        sys.exit(f"❌ {svc.engine_error}")
+    compiled, model = svc.compiled, svc.model
+
+    X = parity_rows(compiled, args.rows, len(svc.current_lookup.classes_))
+    expected = model.predict_proba(X)
+    got = compiled.predict_proba(X)
+    max_diff = float(np.max(np.abs(got - expected)))
+    mismatches = int((compiled.predict(X) != model.predict(X)).sum())
+    print(f"parity: {args.rows} rows, {compiled.n_trees} trees, max |proba diff| {max_diff:.2e}, class mismatches {mismatches}")
+
+    print(f"\n{'batch':>6}{'lightgbm us':>14}{'numpy us':>11}{'speedup':>9}")
+    for bs in (int(b) for b in args.batch_sizes.split(",")):
+        xb = X[:bs]
+        ref = time_call(model.predict, xb, args.repeat)
+        fast = time_call(compiled.predict, xb, args.repeat)
+        print(f"{bs:>6}{ref:>14.1f}{fast:>11.1f}{ref / fast:>8.1f}x")
+    print(f"\nThe service uses the numpy engine for batches up to {svc.NUMPY_MAX_ROWS} rows.")
+
+    if mismatches or max_diff > svc.PARITY_ATOL:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
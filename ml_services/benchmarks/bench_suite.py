@@ -0,0 +1,315 @@
+# benchmarks/bench_suite.py
+"""
+Latency/throughput benchmark for every model, at the service and route level.
+
+Run from ml_services/:
+    python -m benchmarks.bench_suite --out results.json
+    python -m benchmarks.bench_suite --baseline results.json --out new.json
+
+For each model two kinds of targets are measured:
+  service  the service class called directly from N threads
+  route    the FastAPI route called from N concurrent clients through an
+           in-process ASGI transport (no sockets, but the full app stack:
+           validation, micro-batching, middleware, serialization)
+
+Inputs come from each service's sample_inputs(), i.e. they are generated
+from the loaded artifacts' schemas. Every target is run at each
+--concurrency level and reports throughput and p50/p95/p99 latency.
+
+The drawing, stress and cognitive result caches are disabled
+(*_CACHE_SIZE=0) unless --with-cache is given, otherwise repeated
+synthetic inputs would be measured as cache hits.
+
+With --baseline, each result is compared with the matching entry of an
+earlier run; the exit code is 1 when p50 or p99 is slower, or throughput
+is lower, by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+MODELS = ("cognitive", "drawing", "routine", "stress")
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+# -------------------------------
+# Measurement
+# -------------------------------
+
+def summarize(latencies_s: List[float], errors: int, wall_s: float) -> Dict[str, Any]:
+    lat = np.asarray(latencies_s, dtype=float) * 1000.0
+    ok = len(lat)
+    p50, p95, p99 = (float(v) for v in np.percentile(lat, [50, 95, 99])) if ok else (None,) * 3
+    return {
+        "requests": ok + errors,
+        "errors": errors,
+        "wall_s": round(wall_s, 4),
+        "throughput_rps": round(ok / wall_s, 2) if wall_s > 0 else None,
+        "mean_ms": round(float(lat.mean()), 3) if ok else None,
+        "p50_ms": round(p50, 3) if ok else None,
+        "p95_ms": round(p95, 3) if ok else None,
+        "p99_ms": round(p99, 3) if ok else None,
+    }
+
+
+def run_threads(call: Callable[[int], Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    """`requests` calls of call(i) spread over `concurrency` threads."""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                call(i)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for f in [pool.submit(worker) for _ in range(concurrency)]:
+            f.result()
+    return summarize(latencies, errors[0], time.perf_counter() - t0)
+
+
+async def run_clients(call, requests: int, concurrency: int) -> Dict[str, Any]:
+    """`requests` awaits of call(i) spread over `concurrency` client tasks."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                response = await call(i)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - t0)
+
+
+# -------------------------------
+# Targets
+# -------------------------------
+
+def service_calls(name: str, svc, inputs: list, args) -> Callable[[int], Any]:
+    n = len(inputs)
+    if name == "cognitive":
+        return lambda i: svc.predict(inputs[i % n], top_k=args.top_k, explain=args.explain)
+    if name == "drawing":
+        return lambda i: svc.predict_topk(inputs[i % n], k=3)
+    if name == "routine":
+        return lambda i: svc.predict_next_level(inputs[i % n])
+    if name == "stress":
+        return lambda i: svc.predict(inputs[i % n])
+    raise ValueError(name)
+
+
+def route_calls(name: str, client, inputs: list, args):
+    n = len(inputs)
+    if name == "cognitive":
+        return lambda i: client.post(
+            "/predict", json={"features": inputs[i % n], "top_k": args.top_k, "explain": args.explain}
+        )
+    if name == "drawing":
+        return lambda i: client.post(
+            "/drawing/predict", files={"file": ("drawing.png", inputs[i % n], "image/png")}
+        )
+    if name == "routine":
+        return lambda i: client.post("/routine/predict-difficulty", json=inputs[i % n])
+    if name == "stress":
+        return lambda i: client.post("/stress/predict", json=inputs[i % n])
+    raise ValueError(name)
+
+
+def bench_services(registry, models, levels, args) -> List[Dict[str, Any]]:
+    results = []
+    for name in models:
+        svc = registry.get(name)
+        call = service_calls(name, svc, svc.sample_inputs(args.inputs, seed=args.seed), args)
+        for _ in range(args.warmup):
+            call(0)
+        for c in levels:
+            res = run_threads(call, args.requests, c)
+            results.append({"target": name, "kind": "service", "concurrency": c, **res})
+            print_row(results[-1])
+    return results
+
+
+async def bench_routes(app, registry, models, levels, args) -> List[Dict[str, Any]]:
+    import httpx
+
+    results = []
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in models:
+            svc = registry.get(name)
+            call = route_calls(name, client, svc.sample_inputs(args.inputs, seed=args.seed), args)
+            for _ in range(args.warmup):
+                await call(0)
+            for c in levels:
+                res = await run_clients(call, args.requests, c)
+                results.append({"target": name, "kind": "route", "concurrency": c, **res})
+                print_row(results[-1])
+    return results
+
+
+# -------------------------------
+# Reporting
+# -------------------------------
+
+def _fmt(v, width: int, precision: int = 2) -> str:
+    return f"{v:>{width}.{precision}f}" if v is not None else f"{'-':>{width}}"
+
+
+def print_row(r: Dict[str, Any]):
+    print(
+        f"{r['target']:<10}{r['kind']:<8}{r['concurrency']:>5}"
+        f"{_fmt(r['throughput_rps'], 11, 1)}{_fmt(r['p50_ms'], 10)}"
+        f"{_fmt(r['p95_ms'], 10)}{_fmt(r['p99_ms'], 10)}{r['errors']:>8}",
+        flush=True,
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=10
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Annotate results with deltas vs the baseline; return regression messages."""
+    base = {(r["target"], r["kind"], r["concurrency"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\nvs baseline ({baseline.get('meta', {}).get('git_commit')}), tolerance {tolerance:.0%}")
+    for r in results:
+        b = base.get((r["target"], r["kind"], r["concurrency"]))
+        if b is None:
+            continue
+        delta = {}
+        for key in ("p50_ms", "p99_ms", "throughput_rps"):
+            if r.get(key) and b.get(key):
+                delta[key] = round(r[key] / b[key] - 1.0, 4)
+        r["vs_baseline"] = delta
+
+        worse = [
+            k for k, d in delta.items()
+            if (d > tolerance if k.endswith("_ms") else d < -tolerance)
+        ]
+        label = f"{r['target']}/{r['kind']}@{r['concurrency']}"
+        summary = "  ".join(f"{k} {d:+.1%}" for k, d in delta.items())
+        print(f"  {label:<24}{summary}{'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(f"{label}: {', '.join(worse)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default=",".join(MODELS))
+    parser.add_argument("--kinds", default="service,route")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=200, help="requests per target and concurrency level")
+    parser.add_argument("--inputs", type=int, default=64, help="distinct synthetic inputs per model")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--explain", default="sync", choices=("none", "sync", "deferred"))
+    parser.add_argument("--with-cache", action="store_true", help="keep the prediction result caches enabled")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if not args.with_cache:
+        for var in ("DRAWING_CACHE_SIZE", "STRESS_CACHE_SIZE", "COGNITIVE_CACHE_SIZE"):
+            os.environ[var] = "0"
+    # Models are loaded explicitly below, before anything is timed
+    os.environ.setdefault("MODEL_LOADING", "lazy")
+
+    import main as server
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    t0 = time.perf_counter()
+    status = server.registry.load_all()
+    load_s = time.perf_counter() - t0
+    failed = {n: s["error"] for n, s in status.items() if n in models and not s["ready"]}
+    if failed:
+        sys.exit(f"❌ Models failed to load: {failed}")
+
+    print(f"{'target':<10}{'kind':<8}{'conc':>5}{'req/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    results: List[Dict[str, Any]] = []
+    if "service" in kinds:
+        results += bench_services(server.registry, models, levels, args)
+    if "route" in kinds:
+        results += asyncio.run(bench_routes(server.app, server.registry, models, levels, args))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model_load_s": round(load_s, 3),
+            "args": vars(args),
+            "env": {k: v for k, v in os.environ.items() if k.startswith(("BATCH_", "DRAWING_", "STRESS_", "WARMUP"))},
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/check_legacy_parity.py
+"""
+Check that ml_services answers the legacy backend/ml contracts like the
+legacy apps do, before the legacy processes are switched off.
+
+Run from ml_services/:
+    python -m benchmarks.check_legacy_parity --rows 500
+
+Loads backend/ml/Parental_Stress_monitoring/app.py and
+backend/ml/Interactive_Vicual_Task_Scheduler/app.py next to main.app and
+sends the same requests to the legacy routes and to their
+/legacy/<prefix> replacements. The requests are synthetic rows plus edge
+cases: unseen labels, odd casing and whitespace, empty strings, and
+validation errors.
+
+Status codes, keys and values must match; probabilities may differ by up
+to --atol (the stress numpy engine vs Keras). Error details are shown
+but not compared. The exit code is 1 on any mismatch. The same comparison
+runs as a test in tests/test_legacy_parity.py.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+
+from fastapi.testclient import TestClient
+
+import main as server
+
+REPO_DIR = Path(__file__).resolve().parent.parent.parent
+LEGACY_STRESS_APP = REPO_DIR / "backend" / "ml" / "Parental_Stress_monitoring" / "app.py"
+LEGACY_ROUTINE_APP = REPO_DIR / "backend" / "ml" / "Interactive_Vicual_Task_Scheduler" / "app.py"
+
+
+@contextmanager
+def _cwd(path: Path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+def load_legacy_app(path: Path, name: str):
+    # The routine app loads its artifacts by relative path
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    with _cwd(path.parent):
+        spec.loader.exec_module(module)
+    return module.app
+
+
+def stress_cases(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    base = rows[0]
+    return rows + [
+        {**base, "mood": "  HAPPY ", "sleep_quality": "Good"},
+        {**base, "mood": "", "sleep_quality": ""},
+        {**base, "mood": "not-a-mood"},
+        {**base, "late_night_usage_flag": True, "journal_sentiment": -1.0},
+        {**base, "total_screen_time_min": -5},
+        {k: v for k, v in base.items() if k != "unlock_count"},
+    ]
+
+
+def routine_cases(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    base = rows[0]
+    return rows + [
+        {**base, "current_difficulty_level": "not-a-level"},
+        {**base, "runs_count": 3.5},
+        {**base, "avg_completion_rate": 0.0, "completion_rate_trend": 0.0},
+        {k: v for k, v in base.items() if k != "childId"},
+    ]
+
+
+def same(a: Any, b: Any, atol: float) -> bool:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return list(a) == list(b) and all(same(a[k], b[k], atol) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y, atol) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return isinstance(a, (int, float)) and isinstance(b, (int, float)) and abs(a - b) <= atol
+    return a == b
+
+
+def compare(name: str, legacy, new, path: str, new_path: str, cases, atol: float) -> int:
+    mismatches = 0
+    for i, body in enumerate(cases):
+        old_resp = legacy.post(path, json=body)
+        new_resp = new.post(new_path, json=body)
+        if old_resp.status_code != new_resp.status_code:
+            ok = False
+        elif old_resp.status_code == 200:
+            ok = same(old_resp.json(), new_resp.json(), atol)
+        else:
+            ok = True
+            if old_resp.json() != new_resp.json():
+                print(f"  {name} case {i}: same status {old_resp.status_code}, detail differs")
+                print(f"    legacy: {old_resp.text[:200]}")
+                print(f"    new:    {new_resp.text[:200]}")
+        if not ok:
+            mismatches += 1
+            print(f"❌ {name} case {i}: {body}")
+            print(f"    legacy {old_resp.status_code}: {old_resp.text[:300]}")
+            print(f"    new    {new_resp.status_code}: {new_resp.text[:300]}")
+    print(f"{name}: {len(cases)} requests, {mismatches} mismatches")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="synthetic rows per model")
+    parser.add_argument("--atol", type=float, default=1e-5, help="tolerance on probabilities")
+    args = parser.parse_args()
+
+    legacy_stress = TestClient(load_legacy_app(LEGACY_STRESS_APP, "legacy_stress_app"), raise_server_exceptions=False)
+    legacy_routine = TestClient(load_legacy_app(LEGACY_ROUTINE_APP, "legacy_routine_app"), raise_server_exceptions=False)
+
+    mismatches = 0
+    with TestClient(server.app, raise_server_exceptions=False) as new:
+        stress_rows = server.registry.get("stress").sample_inputs(args.rows)
+        routine_rows = server.registry.get("routine").sample_inputs(args.rows)
+
+        mismatches += compare(
+            "stress", legacy_stress, new, "/predict", f"{server.LEGACY_STRESS_PREFIX}/predict",
+            stress_cases(stress_rows), args.atol,
+        )
+        mismatches += compare(
+            "routine", legacy_routine, new, "/predict-difficulty", f"{server.LEGACY_ROUTINE_PREFIX}/predict-difficulty",
+            routine_cases(routine_rows), args.atol,
+        )
+
+    if mismatches:
+        sys.exit(1)
+    print("✅ Legacy contracts match")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,85 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import AfterValidator, BaseModel, ValidationError
+from typing import Annotated, Dict, Any, List, Literal
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import os
+import time
 from pydantic import BaseModel, Field
 
-from services.cognitive_progress_service import CognitiveProgressService
-
-from services.tflite_drawing_service import TFLiteDrawingService
-
-from services.routine_difficulty_service import RoutineDifficultyService
-
-from services.parental_stress_service import ParentalStressService
+from services.batching import MicroBatcher
+from services.job_queue import FINISHED, JobStore, JobWorkers, QueueFull
+from services.metrics import MetricsMiddleware, metrics
+from services.model_registry import ModelRegistry, FAILED
+from services.prediction_capture import PredictionCapture, parse_sample_rates
+from services.serialization import (
+    Float32Response,
+    MsgpackResponse,
+    dumps,
+    is_msgpack,
+    json_response_class,
+    loads,
+    negotiate,
+    unpack,
+)
 
-app = FastAPI()
+# Service modules (TensorFlow, shap, LightGBM, pandas) are imported inside the
+# registry factories below, so importing this module stays cheap.
+#   MODEL_LOADING=eager -> all models load in parallel during startup (default)
+#   MODEL_LOADING=lazy  -> each model loads on the first request that needs it
+MODEL_LOADING = os.getenv("MODEL_LOADING", "eager")
+
+# Hot reload: HOT_RELOAD=1 polls the artifact files every HOT_RELOAD_INTERVAL_S
+# seconds (by mtime, or by content with HOT_RELOAD_CHECKSUM=1) and swaps in a
+# freshly loaded model when they change.
+# PREFORK=1 is set by serve_prefork.py. Its workers accept on one shared
+# socket, so a follow-up request can't be routed to the worker that holds
+# per-process state: deferred explanations and manual reloads are refused,
+# and HOT_RELOAD is ignored (restart serve_prefork.py to roll out new
+# artifacts). /metrics and the cache / batching / capture stats describe
+# whichever worker answered.
+PREFORK = os.getenv("PREFORK", "0") == "1"
+
+HOT_RELOAD = os.getenv("HOT_RELOAD", "0") == "1" and not PREFORK
+registry = ModelRegistry(checksum=os.getenv("HOT_RELOAD_CHECKSUM", "0") == "1")
+
+# Warmup: synthetic inputs (from each model's schema) are run WARMUP_ROUNDS
+# times before a model is reported ready or swapped in. 0 disables it.
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "2"))
+
+def warmup(svc):
+    svc.warmup(rounds=WARMUP_ROUNDS)
+
+WARMUP = warmup if WARMUP_ROUNDS > 0 else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MODEL_LOADING == "eager":
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, registry.load_all)
+    if HOT_RELOAD:
+        registry.start_watcher(float(os.getenv("HOT_RELOAD_INTERVAL_S", "5")))
+    capture.start()
+    if JOBS_ENABLED and JOBS_WORKERS > 0:
+        job_workers.start()
+    yield
+    job_workers.stop()
+    capture.stop()
+    registry.stop_watcher()
+
+
+# JSON_RESPONSE=auto|orjson|stdlib. Prediction routes return FastJSON(...)
+# directly, which also skips FastAPI's jsonable_encoder pass over the result.
+# model= labels the time spent encoding the body (the "serialize" stage).
+FastJSON = json_response_class(os.getenv("JSON_RESPONSE", "auto"))
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSON)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,53 +89,290 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route template; METRICS_ENABLED=0 makes it a pass-through
+app.add_middleware(MetricsMiddleware)
+
 
 BASE_DIR = Path(__file__).resolve().parent
+
+# Prediction capture for drift analysis (needs pyarrow). CAPTURE_ENABLED=1
+# logs sampled inputs, outputs, model fingerprint and latency to rotating
+# Parquet (CAPTURE_FORMAT=arrow: Arrow IPC) files in CAPTURE_DIR. Requests
+# only append to a ring buffer capped at CAPTURE_MAX_BUFFER_MB; a
+# background thread does the writing. CAPTURE_SAMPLE_RATES=drawing=0.1,...
+# overrides CAPTURE_SAMPLE_RATE per model.
+capture = PredictionCapture(
+    Path(os.getenv("CAPTURE_DIR", str(BASE_DIR / "captures"))),
+    enabled=os.getenv("CAPTURE_ENABLED", "0") == "1",
+    file_format=os.getenv("CAPTURE_FORMAT", "parquet"),
+    sample_rate=float(os.getenv("CAPTURE_SAMPLE_RATE", "1")),
+    sample_rates=parse_sample_rates(os.getenv("CAPTURE_SAMPLE_RATES", "")),
+    max_buffer_bytes=int(float(os.getenv("CAPTURE_MAX_BUFFER_MB", "32")) * 1024 * 1024),
+    flush_interval_s=float(os.getenv("CAPTURE_FLUSH_S", "5")),
+    rotate_rows=int(os.getenv("CAPTURE_ROTATE_ROWS", "100000")),
+    rotate_s=float(os.getenv("CAPTURE_ROTATE_S", "3600")),
+)
+
+def model_fingerprint(name):
+    return lambda: registry.model_status(name)["fingerprint"]
+
+def captured(name, batch_fn, inputs=None):
+    # Returns batch_fn itself when capture is disabled
+    return capture.wrap(name, batch_fn, inputs=inputs, version=model_fingerprint(name))
+
+# Micro-batching: concurrent single-row requests are coalesced per model.
+# BATCH_MAX_SIZE=1 turns coalescing off (calls still run off the event loop).
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+tabular_executor = ThreadPoolExecutor(
+    max_workers=BATCH_WORKERS,
+    thread_name_prefix="ml-batch",
+)
+
+# Each batcher runs up to max_concurrency batches at once (one per executor thread)
+def make_batcher(name, batch_fn, executor=tabular_executor, inputs=None, max_concurrency=BATCH_WORKERS):
+    return MicroBatcher(
+        name,
+        captured(name, batch_fn, inputs),
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        executor=executor,
+        max_concurrency=max_concurrency,
+    )
+
+
+def model_health(name: str, details) -> Dict[str, Any]:
+    # Never triggers a load: details(service) is only called once it is ready
+    readiness = registry.model_status(name)
+    if readiness["ready"]:
+        body = details(registry.get(name))
+    else:
+        body = {
+            "status": "error" if readiness["state"] == FAILED else "ok",
+            "model_loaded": False,
+        }
+    return {**body, "readiness": readiness}
+
+
 MODEL_PATH = BASE_DIR / "cognitive_progress_prediction" / "best_cognitive_progress_model.pkl"
 
-service = CognitiveProgressService(MODEL_PATH)
+# Shared by every cognitive instance, so a hot reload keeps deferred tokens
+_deferred_explanations = None
+
+def load_cognitive_service():
+    global _deferred_explanations
+    from services.cognitive_progress_service import CognitiveProgressService, DeferredExplanations
+    if _deferred_explanations is None:
+        _deferred_explanations = DeferredExplanations()
+    return CognitiveProgressService(
+        MODEL_PATH,
+        deferred=_deferred_explanations,
+        cache_max_entries=int(os.getenv("COGNITIVE_CACHE_SIZE", "1024")),
+        cache_ttl_s=float(os.getenv("COGNITIVE_CACHE_TTL_S", "3600")),
+    )
+
+registry.register("cognitive", load_cognitive_service, watch_paths=[MODEL_PATH], warmup=WARMUP)
+cognitive_batcher = make_batcher(
+    "cognitive",
+    lambda items: registry.get("cognitive").predict_batch(
+        [f for f, _, _ in items],
+        top_k=[k for _, k, _ in items],
+        explain=[e for _, _, e in items],
+    ),
+    inputs=lambda items: [f for f, _, _ in items],
+)
 
 ## Cognitive Progress Prediction part
+def _check_explain(mode: str) -> str:
+    # A deferred token lives in the worker that issued it
+    if mode == "deferred" and PREFORK:
+        raise ValueError("explain=deferred is not available with serve_prefork.py; use sync or none")
+    return mode
+
+Explain = Annotated[Literal["none", "sync", "deferred"], AfterValidator(_check_explain)]
+
+
 class PredictRequest(BaseModel):
     features: Dict[str, Any]
     top_k: int = 10
+    explain: Explain = "sync"
+
+
+class PredictBatchRequest(BaseModel):
+    items: List[Dict[str, Any]] = Field(..., min_length=1)
+    top_k: int = 10
+    explain: Explain = "sync"
 
 
 @app.get("/health")
 def health():
-    return service.health()
+    return model_health("cognitive", lambda svc: svc.health())
+
+
+@app.get("/schema")
+async def schema():
+    service = await registry.aget("cognitive")
+    return service.describe_schema()
 
 
 @app.post("/predict")
-def predict(req: PredictRequest):
-    return service.predict(features=req.features, top_k=req.top_k)
+async def predict(req: PredictRequest):
+    return FastJSON(await cognitive_batcher.submit((req.features, req.top_k, req.explain)), model="cognitive")
+
+
+async def parse_body(request: Request, model):
+    # JSON is parsed and validated in one pass by pydantic-core; msgpack
+    # bodies (Content-Type: application/msgpack) are unpacked first
+    body = await request.body()
+    try:
+        if is_msgpack(request.headers.get("content-type")):
+            return model.model_validate(unpack(body))
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+
+def batch_response(request: Request, body: Dict[str, Any], model: str):
+    if negotiate(request.headers.get("accept")) == "msgpack":
+        return MsgpackResponse(body, model=model)
+    return FastJSON(body, model=model)
+
+
+@app.post("/predict-batch")
+async def predict_batch_cognitive(request: Request):
+    """
+    Body: PredictBatchRequest as JSON or msgpack. Response: JSON, msgpack
+    (Accept: application/msgpack) or the predicted scores only as float32
+    (Accept: application/x-float32; explain is skipped).
+    """
+    req = await parse_body(request, PredictBatchRequest)
+    fmt = negotiate(request.headers.get("accept"), float32=True)
+    explain = "none" if fmt == "float32" else req.explain
+
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(
+        tabular_executor,
+        lambda: captured(
+            "cognitive",
+            lambda items: registry.get("cognitive").predict_batch(items, top_k=req.top_k, explain=explain),
+        )(req.items),
+    )
+    if fmt == "float32":
+        scores = [r["predicted_score_next_14_days"] for r in results]
+        return Float32Response(scores, columns=["predicted_score_next_14_days"], model="cognitive")
+    return batch_response(request, {"count": len(results), "results": results}, "cognitive")
+
+
+@app.get("/cognitive/cache/stats")
+def cognitive_cache_stats():
+    if not registry.is_ready("cognitive"):
+        return {"enabled": False, "readiness": registry.model_status("cognitive")}
+    return registry.get("cognitive").cache_stats()
+
+
+@app.get("/explanations/{token}")
+def get_explanation(token: str):
+    # Tokens live in this process's memory for 10 minutes (not in prefork
+    # workers or job results). They survive a model reload: the explanation
+    # is computed by the model version that issued the token.
+    result = registry.get("cognitive").get_explanation(token)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation token")
+    return result
 
 
 ## Drawing prediction part
-MODEL_PATH_DRAWING = BASE_DIR / "gemified" / "chromabloom_model.tflite"
+# DRAWING_MODEL_VARIANT=float16 / int8 serves chromabloom_model_<variant>.tflite
+# (see quantize_drawing_model.py and benchmarks/bench_drawing_variants.py)
+DRAWING_MODEL_VARIANT = os.getenv("DRAWING_MODEL_VARIANT", "")
+MODEL_PATH_DRAWING = BASE_DIR / "gemified" / (
+    f"chromabloom_model_{DRAWING_MODEL_VARIANT}.tflite" if DRAWING_MODEL_VARIANT else "chromabloom_model.tflite"
+)
 LABELS_PATH_DRAWING = BASE_DIR / "gemified" / "class_labels.json"
-
-# ✅ Create service once (loaded at startup)
-drawing_service = TFLiteDrawingService(
-    model_path=MODEL_PATH_DRAWING,
-    labels_path=LABELS_PATH_DRAWING,
-    img_size=(224, 224),
+DRAWING_POOL_SIZE = int(os.getenv("DRAWING_POOL_SIZE", "2"))
+
+def load_drawing_service():
+    from services.tflite_drawing_service import TFLiteDrawingService
+    return TFLiteDrawingService(
+        model_path=MODEL_PATH_DRAWING,
+        labels_path=LABELS_PATH_DRAWING,
+        img_size=(224, 224),
+        pool_size=DRAWING_POOL_SIZE,
+        num_threads=int(os.getenv("DRAWING_NUM_THREADS", "1")),
+        xnnpack=os.getenv("DRAWING_XNNPACK", "1") == "1",
+        preprocess_mode=os.getenv("DRAWING_PREPROCESS", "exact"),
+        cache_max_entries=int(os.getenv("DRAWING_CACHE_SIZE", "1024")),
+        cache_ttl_s=float(os.getenv("DRAWING_CACHE_TTL_S", "3600")),
+        cache_max_bytes=int(float(os.getenv("DRAWING_CACHE_MAX_MB", "16")) * 1024 * 1024),
+    )
+
+registry.register("drawing", load_drawing_service, watch_paths=[MODEL_PATH_DRAWING, LABELS_PATH_DRAWING], warmup=WARMUP)
+def _drawing_inputs(images):
+    # Images are not logged, only their size
+    return [{"image_bytes": len(b)} for b in images]
+
+# Runs on the default executor, one batch per pooled interpreter at a time
+drawing_batcher = make_batcher(
+    "drawing",
+    lambda images: registry.get("drawing").predict_topk_batch(images, k=3),
+    inputs=_drawing_inputs,
+    executor=None,
+    max_concurrency=DRAWING_POOL_SIZE,
 )
 
-@app.get("/health")
-def health():
-    return {
+@app.get("/drawing/health")
+def drawing_health():
+    return model_health("drawing", lambda svc: {
         "status": "ok",
-        "model_found": drawing_service.model_path.exists(),
-        "labels_found": drawing_service.labels_path.exists(),
-        "labels_count": len(drawing_service.labels),
-    }
+        "model_found": svc.model_path.exists(),
+        "model_file": svc.model_path.name,
+        "num_threads": svc.pool.num_threads,
+        "xnnpack": svc.pool.xnnpack,
+        "labels_found": svc.labels_path.exists(),
+        "labels_count": len(svc.labels),
+    })
 
 @app.post("/drawing/predict")
 async def predict(file: UploadFile = File(...)):
     image_bytes = await file.read()
-    result = drawing_service.predict_topk(image_bytes, k=3)
-    return {"top1": result["top1"], "top3": result["topk"]}
+    result = await drawing_batcher.submit(image_bytes)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return FastJSON({"top1": result["top1"], "top3": result["topk"]}, model="drawing")
+
+@app.post("/drawing/predict-batch")
+async def predict_batch(request: Request, files: List[UploadFile] = File(...)):
+    """
+    Response: JSON, msgpack (Accept: application/msgpack) or the full
+    [N, num_classes] score matrix as float32 (Accept: application/x-float32;
+    X-Columns lists the labels, rows of undecodable images are NaN).
+    """
+    images = [await f.read() for f in files]
+    drawing_service = await registry.aget("drawing")
+    if negotiate(request.headers.get("accept"), float32=True) == "float32":
+        loop = asyncio.get_running_loop()
+        scores = await loop.run_in_executor(drawing_service.executor, drawing_service.predict_proba_batch, images)
+        return Float32Response(scores, columns=drawing_service.labels, model="drawing")
+    t0 = time.perf_counter()
+    results = await drawing_service.predict_topk_batch_async(images, k=3)
+    capture.record_batch(
+        "drawing", images, results, time.perf_counter() - t0, _drawing_inputs, model_fingerprint("drawing")
+    )
+
+    items = []
+    for f, result in zip(files, results):
+        if "error" in result:
+            items.append({"filename": f.filename, "error": result["error"]})
+        else:
+            items.append({"filename": f.filename, "top1": result["top1"], "top3": result["topk"]})
+    return batch_response(request, {"count": len(items), "results": items}, "drawing")
+
+@app.get("/drawing/cache/stats")
+def drawing_cache_stats():
+    if not registry.is_ready("drawing"):
+        return {"enabled": False, "readiness": registry.model_status("drawing")}
+    return registry.get("drawing").cache_stats()
 
 
 # -------------------------------
@@ -77,7 +380,16 @@ async def predict(file: UploadFile = File(...)):
 # -------------------------------
 ROUTINE_DIR = BASE_DIR / "interactive_visual_task_scheduler"
 
-routine_service = RoutineDifficultyService(ROUTINE_DIR)
+def load_routine_service():
+    from services.routine_difficulty_service import RoutineDifficultyService
+    # ROUTINE_ENGINE=lightgbm turns the compiled trees off
+    return RoutineDifficultyService(ROUTINE_DIR, engine=os.getenv("ROUTINE_ENGINE", "numpy"))
+
+registry.register("routine", load_routine_service, watch_paths=[ROUTINE_DIR], warmup=WARMUP)
+routine_batcher = make_batcher(
+    "routine",
+    lambda items: registry.get("routine").predict_next_level_batch(items),
+)
 
 class RoutinePredictRequest(BaseModel):
     childId: str
@@ -95,16 +407,134 @@ def routine_health():
         "routine_model_found": (ROUTINE_DIR / "routine_difficulty_lgbm_model.joblib").exists(),
         "current_encoder_found": (ROUTINE_DIR / "current_level_encoder.joblib").exists(),
         "next_encoder_found": (ROUTINE_DIR / "next_level_encoder.joblib").exists(),
+        **(registry.get("routine").health() if registry.is_ready("routine") else {}),
+        "readiness": registry.model_status("routine"),
     }
 
 @app.post("/routine/predict-difficulty")
-def routine_predict_difficulty(req: RoutinePredictRequest):
+async def routine_predict_difficulty(req: RoutinePredictRequest):
 
-    result = routine_service.predict_next_level(req.model_dump())
-    return {
+    result = await routine_batcher.submit(req.model_dump())
+    return FastJSON({
         "childId": req.childId,
         **result
-    }
+    }, model="routine")
+
+
+# Rows per model call on the batch route
+ROUTINE_BATCH_CHUNK = int(os.getenv("ROUTINE_BATCH_CHUNK", "2048"))
+
+
+async def _ndjson_lines(request: Request):
+    # Reads the body as it arrives; only one partial line is buffered
+    buffer = b""
+    async for block in request.stream():
+        buffer += block
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def _list_rows(items: list):
+    for item in items:
+        yield item
+
+
+def _row_error(e: Exception):
+    if isinstance(e, ValidationError):
+        return loads(e.json(include_url=False))
+    return str(e)
+
+
+def _predict_routine_chunk(service, chunk) -> bytes:
+    # chunk: [(index, row dict or None, error or None)], one model call for the valid rows
+    valid = [item for _, item, _ in chunk if item is not None]
+    results = []
+    if valid:
+        try:
+            results = captured("routine", service.predict_next_level_batch)(valid)
+        except Exception:
+            # e.g. an unknown current_difficulty_level, or a model error: the
+            # response is already streaming (200), so every row still gets a
+            # line and only the failing rows carry an error
+            results = []
+            for item in valid:
+                try:
+                    results.append(service.predict_next_level(item))
+                except Exception as e:
+                    results.append({"error": str(e)})
+    results = iter(results)
+
+    with metrics.stage("routine", "serialize"):
+        lines = []
+        for i, item, error in chunk:
+            if item is None:
+                lines.append(dumps({"index": i, "error": error}))
+            else:
+                lines.append(dumps({"index": i, "childId": item["childId"], **next(results)}))
+        return b"\n".join(lines) + b"\n"
+
+
+async def _routine_stream(service, rows):
+    loop = asyncio.get_running_loop()
+    chunk = []
+    index = 0
+    async for row in rows:
+        try:
+            if isinstance(row, bytes):
+                row = loads(row)
+            chunk.append((index, RoutinePredictRequest.model_validate(row).model_dump(), None))
+        except ValueError as e:
+            chunk.append((index, None, _row_error(e)))
+        index += 1
+        if len(chunk) >= ROUTINE_BATCH_CHUNK:
+            yield await loop.run_in_executor(tabular_executor, _predict_routine_chunk, service, chunk)
+            chunk = []
+    if chunk:
+        yield await loop.run_in_executor(tabular_executor, _predict_routine_chunk, service, chunk)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body generator may still be reading the request.
+    The stock class listens for a disconnect on receive() at the same time,
+    which would swallow request body chunks; here a disconnect surfaces as
+    ClientDisconnect from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+@app.post("/routine/predict-difficulty-batch")
+async def routine_predict_difficulty_batch(request: Request):
+    """
+    Body: a JSON list of rows, {"items": [...]}, the same as msgpack
+    (Content-Type: application/msgpack), or NDJSON (one row per line,
+    Content-Type: application/x-ndjson). NDJSON is read incrementally, so
+    memory stays flat for any input size.
+    Response: NDJSON, one line per input row in input order, either
+    {"index", "childId", "next_difficulty_level"} or {"index", "error"}.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        rows = _ndjson_lines(request)
+    else:
+        try:
+            body = unpack(await request.body()) if is_msgpack(content_type) else loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON or NDJSON")
+        items = body.get("items") if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail='Expected a list of rows or {"items": [...]}')
+        rows = _list_rows(items)
+
+    # One model version for the whole stream, even if a reload happens meanwhile
+    service = await registry.aget("routine")
+    return DuplexStreamingResponse(_routine_stream(service, rows), media_type="application/x-ndjson")
 
 
 
@@ -114,7 +544,21 @@ def routine_predict_difficulty(req: RoutinePredictRequest):
 # -------------------------------
 
 STRESS_DIR = BASE_DIR / "parental_stress_monitoring"
-stress_service = ParentalStressService(STRESS_DIR)
+
+def load_stress_service():
+    from services.parental_stress_service import ParentalStressService
+    return ParentalStressService(
+        STRESS_DIR,
+        engine=os.getenv("STRESS_ENGINE", "numpy"),
+        cache_max_entries=int(os.getenv("STRESS_CACHE_SIZE", "1024")),
+        cache_ttl_s=float(os.getenv("STRESS_CACHE_TTL_S", "3600")),
+    )
+
+registry.register("stress", load_stress_service, watch_paths=[STRESS_DIR], warmup=WARMUP)
+stress_batcher = make_batcher(
+    "stress",
+    lambda items: registry.get("stress").predict_batch(items),
+)
 
 class StressPredictRequest(BaseModel):
     total_screen_time_min: float = Field(..., ge=0)
@@ -130,9 +574,325 @@ class StressPredictRequest(BaseModel):
 
 @app.get("/stress/health")
 def stress_health():
-    return stress_service.health()
+    return model_health("stress", lambda svc: svc.health())
 
 @app.post("/stress/predict")
-def stress_predict(req: StressPredictRequest):
-    return stress_service.predict(req.model_dump())
+async def stress_predict(req: StressPredictRequest):
+    return FastJSON(await stress_batcher.submit(req.model_dump()), model="stress")
+
+@app.get("/stress/cache/stats")
+def stress_cache_stats():
+    if not registry.is_ready("stress"):
+        return {"enabled": False, "readiness": registry.model_status("stress")}
+    return registry.get("stress").cache_stats()
+
+
+# -------------------------------
+# Legacy backend/ml contracts
+# -------------------------------
+# backend/ml/Parental_Stress_monitoring and backend/ml/Interactive_Vicual_Task_Scheduler
+# ran as separate processes with their own copies of the models above. Their
+# routes are served here on the shared models: a legacy client only changes its
+# base URL to <this server>/legacy/<prefix>. Parity is checked by
+# benchmarks/check_legacy_parity.py.
+LEGACY_STRESS_PREFIX = "/legacy/parental-stress"
+LEGACY_ROUTINE_PREFIX = "/legacy/task-scheduler"
+
+
+async def _legacy_call(awaitable):
+    # The legacy apps answered every inference error with 500 {"detail": str(e)}
+    try:
+        return await awaitable
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get(f"{LEGACY_STRESS_PREFIX}/health")
+def legacy_stress_health():
+    loaded = registry.is_ready("stress")
+    return {
+        "status": "ok",
+        "model_loaded": loaded,
+        "model_path": str(STRESS_DIR / "stress_level_model.keras"),
+        "preprocessor_loaded": loaded,
+        "meta_loaded": loaded,
+    }
+
+@app.post(f"{LEGACY_STRESS_PREFIX}/predict")
+async def legacy_stress_predict(req: StressPredictRequest):
+    result = await _legacy_call(stress_batcher.submit(req.model_dump()))
+    # The legacy response nests the probabilities: [[p_low, p_medium, p_high, p_critical]]
+    return FastJSON({**result, "raw": [result["raw"]]}, model="stress")
+
+
+@app.get(f"{LEGACY_ROUTINE_PREFIX}/health")
+def legacy_routine_health():
+    return {"status": "ok"}
+
+@app.post(f"{LEGACY_ROUTINE_PREFIX}/predict-difficulty")
+async def legacy_routine_predict_difficulty(req: RoutinePredictRequest):
+    result = await _legacy_call(routine_batcher.submit(req.model_dump()))
+    return FastJSON({"childId": req.childId, **result}, model="routine")
+
+
+# -------------------------------
+# Async jobs
+# -------------------------------
+# POST /jobs queues predictions and answers at once (202) with job ids.
+# Workers drain the queue in batches of one model at a time; results are
+# polled with GET /jobs/{id} or fetched in bulk with POST /jobs/results.
+# The queue is a SQLite WAL file (JOBS_DB): it survives restarts and is
+# shared by all serve_prefork.py workers. Submits that would take the
+# queued + running jobs past JOBS_MAX_PENDING get a 429.
+# Opt-in with JOBS_ENABLED=1 (nothing touches JOBS_DB otherwise).
+# JOBS_WORKERS=0 only accepts jobs (another process drains the same file).
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "0") == "1"
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", "10000"))
+JOBS_POLL_S = float(os.getenv("JOBS_POLL_MS", "100")) / 1000.0
+
+job_store = JobStore(
+    os.getenv("JOBS_DB", str(BASE_DIR / "jobs.sqlite3")),
+    lease_s=float(os.getenv("JOBS_LEASE_S", "300")),
+    max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", "3")),
+)
+
+
+def _routine_jobs(items):
+    results = registry.get("routine").predict_next_level_batch(items)
+    return [{"childId": item["childId"], **r} for item, r in zip(items, results)]
+
+class PredictJobRequest(PredictRequest):
+    # A deferred token resolves only in the process that ran the job, and the
+    # job result outlives it (JOBS_WORKERS=0, restarts, other replicas)
+    explain: Literal["none", "sync"] = "sync"
+
+
+# model -> (request schema of its single-prediction route, batch function)
+JOB_MODELS = {
+    "cognitive": (
+        PredictJobRequest,
+        lambda items: registry.get("cognitive").predict_batch(
+            [i["features"] for i in items],
+            top_k=[i["top_k"] for i in items],
+            explain=[i["explain"] for i in items],
+        ),
+    ),
+    "routine": (RoutinePredictRequest, _routine_jobs),
+    "stress": (StressPredictRequest, lambda items: registry.get("stress").predict_batch(items)),
+}
+
+job_workers = JobWorkers(
+    job_store,
+    {name: captured(name, fn) for name, (_, fn) in JOB_MODELS.items()},
+    workers=JOBS_WORKERS,
+    max_batch_size=int(os.getenv("JOBS_MAX_BATCH", "64")),
+    poll_interval_s=JOBS_POLL_S,
+    retention_s=float(os.getenv("JOBS_RETENTION_S", "86400")),
+)
+
+
+class JobSubmitRequest(BaseModel):
+    model: Literal["cognitive", "routine", "stress"]
+    # Each item is the body of the model's single-prediction route
+    items: List[Dict[str, Any]] = Field(..., min_length=1)
+
+
+class JobResultsRequest(BaseModel):
+    job_ids: List[str] = Field(..., min_length=1)
+    # Long poll: wait up to wait_s for every job to finish
+    wait_s: float = Field(0.0, ge=0, le=30)
+
+
+def _check_jobs_enabled():
+    if not JOBS_ENABLED:
+        raise HTTPException(status_code=404, detail="Async jobs are disabled (JOBS_ENABLED=0)")
+
+
+@app.post("/jobs", status_code=202)
+async def submit_jobs(request: Request):
+    _check_jobs_enabled()
+    req = await parse_body(request, JobSubmitRequest)
+    schema, _ = JOB_MODELS[req.model]
+    payloads = []
+    for i, item in enumerate(req.items):
+        try:
+            payloads.append(schema.model_validate(item).model_dump())
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**err, "loc": ("body", "items", i, *err["loc"])} for err in e.errors(include_url=False)]
+            )
+
+    loop = asyncio.get_running_loop()
+    try:
+        job_ids = await loop.run_in_executor(
+            None, lambda: job_store.submit(req.model, payloads, max_pending=JOBS_MAX_PENDING)
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Job queue is full: {e}", headers={"Retry-After": "1"})
+    job_workers.notify()
+    return FastJSON({"model": req.model, "job_ids": job_ids}, status_code=202, model="jobs")
+
+
+@app.get("/jobs/stats")
+def jobs_stats():
+    _check_jobs_enabled()
+    return {
+        "db": str(job_store.path),
+        "max_pending": JOBS_MAX_PENDING,
+        "pending": job_store.pending(),
+        "jobs": job_store.counts(),
+        "workers": job_workers.stats(),
+    }
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    _check_jobs_enabled()
+    job = job_store.get([job_id]).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return FastJSON(job, model="jobs")
+
+
+@app.post("/jobs/results")
+async def job_results(request: Request):
+    """
+    Body: JobResultsRequest. Jobs come back in the requested order; ids that
+    are unknown (or purged after JOBS_RETENTION_S) are listed in "missing".
+    """
+    _check_jobs_enabled()
+    req = await parse_body(request, JobResultsRequest)
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + req.wait_s
+    while True:
+        found = await loop.run_in_executor(None, job_store.get, req.job_ids)
+        pending = sum(job["status"] not in FINISHED for job in found.values())
+        if pending == 0 or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(JOBS_POLL_S)
+
+    return batch_response(request, {
+        "pending": pending,
+        "jobs": [found[j] for j in req.job_ids if j in found],
+        "missing": [j for j in req.job_ids if j not in found],
+    }, "jobs")
+
+
+@app.get("/batching/stats")
+def batching_stats():
+    return {
+        b.name: b.stats()
+        for b in (cognitive_batcher, drawing_batcher, routine_batcher, stress_batcher)
+    }
+
+
+# -------------------------------
+# Metrics
+# -------------------------------
+
+# Gauges are read at scrape time only
+metrics.gauge(
+    "ml_queue_depth",
+    "Requests waiting in a model's micro-batch queue",
+    lambda: {
+        (("model", b.name),): b.queue_depth
+        for b in (cognitive_batcher, drawing_batcher, routine_batcher, stress_batcher)
+    },
+)
+metrics.gauge(
+    "ml_model_ready",
+    "1 when the model is loaded and warmed up",
+    lambda: {(("model", name),): int(registry.is_ready(name)) for name in registry.names},
+)
+CACHED_MODELS = ("cognitive", "drawing", "stress")
+
+def _cache_gauge(field):
+    return lambda: {
+        (("model", name),): registry.get(name).cache_stats()[field]
+        for name in CACHED_MODELS
+        if registry.is_ready(name)
+    }
+
+metrics.gauge("ml_cache_hits", "Prediction cache hits since the model was loaded", _cache_gauge("hits"))
+metrics.gauge("ml_cache_misses", "Prediction cache misses since the model was loaded", _cache_gauge("misses"))
+metrics.gauge("ml_cache_hit_rate", "Prediction cache hits / lookups", _cache_gauge("hit_rate"))
+metrics.gauge("ml_cache_entries", "Entries in the prediction cache", _cache_gauge("entries"))
+metrics.gauge(
+    "ml_jobs",
+    "Async jobs in the queue database by status",
+    lambda: {
+        (("model", model), ("status", status)): n
+        for model, by_status in job_store.counts().items()
+        for status, n in by_status.items()
+    } if JOBS_ENABLED else {},
+)
+metrics.gauge(
+    "ml_model_version",
+    "Number of times the model has been (re)loaded",
+    lambda: {(("model", name),): s["version"] for name, s in registry.status().items()},
+)
+
+
+metrics.gauge(
+    "ml_capture_buffered_bytes",
+    "Prediction capture records waiting to be written, in bytes",
+    lambda: {(): capture.stats()["buffered_bytes"]} if capture.enabled else {},
+)
+metrics.gauge(
+    "ml_capture_dropped",
+    "Captured predictions lost to the memory cap or write errors",
+    lambda: {(): capture.dropped} if capture.enabled else {},
+)
+
+
+@app.get("/capture/stats")
+def capture_stats():
+    return capture.stats()
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+
+# -------------------------------
+# Model readiness
+# -------------------------------
+
+@app.get("/models")
+def models_status():
+    return {
+        "loading_mode": MODEL_LOADING,
+        "hot_reload": HOT_RELOAD,
+        "prefork": PREFORK,
+        "pid": os.getpid(),
+        "models": registry.status(),
+    }
+
 
+@app.post("/models/{name}/reload")
+def reload_model(name: str):
+    if name not in registry.names:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    if PREFORK:
+        # Would only swap the model in the one worker that got the request
+        raise HTTPException(
+            status_code=409, detail="Reload is per process under serve_prefork.py; restart it to load new artifacts"
+        )
+    ok = registry.reload(name)
+    status = registry.model_status(name)
+    if not ok:
+        raise HTTPException(status_code=500, detail=status)
+    return status
+
+
+@app.get("/ready")
+def ready():
+    body = {"ready": registry.all_ready(), "models": registry.status()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
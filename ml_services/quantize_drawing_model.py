@@ -0,0 +1,111 @@
+# quantize_drawing_model.py
+"""
+Convert the float drawing model into a quantized TFLite variant.
+
+Run from ml_services/:
+    python quantize_drawing_model.py exports/drawing_model.keras --mode float16
+    python quantize_drawing_model.py exports/drawing_savedmodel --mode int8 --calibration-dir data/drawings/train
+
+The source is the float training export (a .keras / .h5 file or a
+SavedModel directory). It is not the shipped .tflite, because TFLite
+files can't be re-quantized. Modes:
+  dynamic  int8 weights, float activations (how chromabloom_model.tflite is built)
+  float16  float16 weights, dequantized at load; half the float32 size
+  int8     int8 weights and activations, calibrated on --calibration-dir
+           images with the serving preprocessing
+
+Input and output stay float32 in every mode, so TFLiteDrawingService
+serves the result unchanged. The output goes next to the shipped model as
+gemified/chromabloom_model_<mode>.tflite, selected with
+DRAWING_MODEL_VARIANT=<mode>. Compare variants on the validation set
+with `python -m benchmarks.bench_drawing_variants` before switching.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+import tensorflow as tf
+
+from services.tflite_drawing_service import preprocess_image
+
+BASE_DIR = Path(__file__).resolve().parent
+SHIPPED_MODEL = BASE_DIR / "gemified" / "chromabloom_model.tflite"
+MODES = ("dynamic", "float16", "int8")
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".webp")
+
+
+def find_images(root: Path) -> List[Path]:
+    return sorted(p for p in root.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def make_converter(source: Path) -> tf.lite.TFLiteConverter:
+    if source.is_dir():
+        return tf.lite.TFLiteConverter.from_saved_model(str(source))
+    if source.suffix in (".keras", ".h5"):
+        model = tf.keras.models.load_model(source, compile=False)
+        return tf.lite.TFLiteConverter.from_keras_model(model)
+    raise ValueError(f"❌ Expected a .keras/.h5 file or a SavedModel directory, got {source}")
+
+
+def representative_dataset(images: List[Path], img_size) -> Iterator[List[np.ndarray]]:
+    for path in images:
+        yield [preprocess_image(path.read_bytes(), img_size)]
+
+
+def convert(source: Path, mode: str, calibration: List[Path], img_size) -> bytes:
+    converter = make_converter(source)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        if not calibration:
+            raise RuntimeError("❌ int8 needs calibration images (--calibration-dir)")
+        converter.representative_dataset = lambda: representative_dataset(calibration, img_size)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.float32
+        converter.inference_output_type = tf.float32
+    return converter.convert()
+
+
+def io_shapes(model_path: Path):
+    interp = tf.lite.Interpreter(model_path=str(model_path))
+    inp, out = interp.get_input_details()[0], interp.get_output_details()[0]
+    return [int(v) for v in inp["shape"][1:]], inp["dtype"].__name__, [int(v) for v in out["shape"][1:]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="float model: .keras / .h5 file or SavedModel directory")
+    parser.add_argument("--mode", required=True, choices=MODES)
+    parser.add_argument("--calibration-dir", help="int8: folder of training drawings (searched recursively)")
+    parser.add_argument("--samples", type=int, default=300, help="int8: calibration images to use")
+    parser.add_argument("--img-size", type=int, default=224)
+    parser.add_argument("--output", help="default: gemified/chromabloom_model_<mode>.tflite")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    output = Path(args.output) if args.output else BASE_DIR / "gemified" / f"chromabloom_model_{args.mode}.tflite"
+    img_size = (args.img_size, args.img_size)
+
+    calibration: List[Path] = []
+    if args.calibration_dir:
+        calibration = find_images(Path(args.calibration_dir))
+        rng = np.random.default_rng(0)
+        if len(calibration) > args.samples:
+            calibration = [calibration[i] for i in sorted(rng.choice(len(calibration), args.samples, replace=False))]
+        print(f"Calibrating on {len(calibration)} images")
+
+    output.write_bytes(convert(source, args.mode, calibration, img_size))
+
+    # The variant must be a drop-in replacement for the shipped model
+    shapes = io_shapes(output)
+    if SHIPPED_MODEL.exists() and shapes != io_shapes(SHIPPED_MODEL):
+        output.unlink()
+        sys.exit(f"❌ Input/output {shapes} differ from {SHIPPED_MODEL.name} {io_shapes(SHIPPED_MODEL)}")
+    print(f"✅ {output} ({output.stat().st_size / 1e6:.2f} MB, input {shapes[0]} {shapes[1]}, output {shapes[2]})")
+
+
+if __name__ == "__main__":
+    main()
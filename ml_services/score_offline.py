@@ -0,0 +1,342 @@
+# score_offline.py
+"""
+Offline bulk scoring of CSV / Parquet files with the serving models.
+
+Run from ml_services/:
+    python score_offline.py stress exports/usage.csv scores/stress.parquet
+    python score_offline.py cognitive sessions.parquet out.csv --workers 8 --chunk-size 20000
+    python score_offline.py drawing drawings.csv out.csv --image-column path
+
+The input is read in chunks (pandas CSV chunks, or Parquet record batches
+from a memory-mapped file), each chunk is scored with one batched predict
+in a pool of worker processes, and results are appended to the output in
+input order as they complete. At most 2 * workers chunks are in flight,
+so memory is bounded by the chunk size, not the file size.
+
+Each worker loads its model once, using the same factories and env
+settings (STRESS_ENGINE, ROUTINE_ENGINE, ...) as the API. Output rows
+are the input columns (or --keep columns) plus the model's output
+columns; rows that can't be scored get an `error` value instead of
+stopping the run.
+
+Parquet input/output needs pyarrow.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MODELS = ("cognitive", "drawing", "routine", "stress")
+
+# Output columns and dtypes, fixed so every chunk has the same schema
+OUTPUT_COLUMNS = {
+    "cognitive": {"predicted_score_next_14_days": "float64", "explainability": "object"},
+    "drawing": {"top1_label": "object", "top1_confidence": "float64", "topk": "object"},
+    "routine": {"next_difficulty_level": "object"},
+    "stress": {
+        "stress_score": "Int64",
+        "stress_level": "object",
+        "stress_probability": "float64",
+        "stress_probabilities": "object",
+    },
+}
+
+_service = None
+_options: Dict[str, Any] = {}
+_text_columns: List[str] = []
+
+
+# -------------------------------
+# Reading / writing
+# -------------------------------
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("❌ Parquet files need pyarrow: pip install pyarrow")
+
+
+def _is_parquet(path: Path) -> bool:
+    return path.suffix.lower() in (".parquet", ".pq")
+
+
+def read_chunks(path: Path, chunk_size: int, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    if _is_parquet(path):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(path, memory_map=True)
+        for batch in pf.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns)
+
+
+class ChunkWriter:
+    """
+    Appends DataFrames to a CSV file or to row groups of a Parquet file.
+
+    The Parquet schema is fixed by the first chunk, but CSV chunks infer
+    their dtypes independently: an integer column may hold a fractional
+    value (or a gap) further down. Plain int64 columns are therefore
+    written as float64. Nullable Int64 columns (the model outputs) keep
+    their type.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self._writer = None
+        self._schema = None
+        self.rows = 0
+        if self.parquet:
+            _require_pyarrow()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.unlink()
+
+    def write(self, df: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                for i, field in enumerate(schema):
+                    dtype = df[field.name].dtype
+                    if pa.types.is_null(field.type):
+                        # An all-None text column in the first chunk would be typed null
+                        schema = schema.set(i, field.with_type(pa.string()))
+                    elif isinstance(dtype, np.dtype) and dtype.kind in "iu":
+                        schema = schema.set(i, field.with_type(pa.float64()))
+                self._schema = schema
+                self._writer = pq.ParquetWriter(self.path, schema)
+            self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        else:
+            df.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+# -------------------------------
+# Scoring (runs in worker processes)
+# -------------------------------
+
+def _init_worker(model: str, options: Dict[str, Any]):
+    global _service, _options, _text_columns
+    if options.get("single_threaded"):
+        # One process per core: keep BLAS / OpenMP / TF from oversubscribing
+        for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+            os.environ.setdefault(var, "1")
+    os.environ.setdefault("WARMUP_ROUNDS", "0")
+
+    import main
+
+    factories = {
+        "cognitive": main.load_cognitive_service,
+        "drawing": main.load_drawing_service,
+        "routine": main.load_routine_service,
+        "stress": main.load_stress_service,
+    }
+    _service = factories[model]()
+    _options = {**options, "model": model}
+
+    # Columns the model reads as strings; CSV type inference turns e.g. "0" into 0
+    if model == "cognitive":
+        _text_columns = list(_service.schema.categorical)
+    elif model == "stress":
+        _text_columns = ["mood", "sleep_quality"]
+    elif model == "routine":
+        _text_columns = ["childId", "current_difficulty_level"]
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            value = int(value)  # a CSV column with gaps is read as float
+    return str(value)
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # NaN -> None so services see missing values the way a JSON request would
+    df = df.astype(object).where(df.notna(), None)
+    for c in _text_columns:
+        if c in df.columns:
+            df[c] = df[c].map(_text)
+    return df.to_dict("records")
+
+
+def _predict_rows(rows: List[Any]) -> List[Dict[str, Any]]:
+    svc, opts = _service, _options
+    model = opts["model"]
+    if model == "cognitive":
+        return svc.predict_batch(rows, top_k=opts["top_k"], explain=opts["explain"])
+    if model == "routine":
+        return svc.predict_next_level_batch(rows)
+    if model == "stress":
+        return svc.predict_batch(rows)
+    if model == "drawing":
+        images = []
+        for path in rows:
+            with open(path, "rb") as f:
+                images.append(f.read())
+        return svc.predict_topk_batch(images, k=opts["top_k"])
+    raise ValueError(model)
+
+
+def _flatten(model: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if "error" in result:
+        return {"error": str(result["error"])}
+    if model == "cognitive":
+        out = {"predicted_score_next_14_days": result["predicted_score_next_14_days"]}
+        if result.get("explainability") is not None:
+            out["explainability"] = json.dumps(result["explainability"])
+        return out
+    if model == "stress":
+        return {
+            "stress_score": result["stress_score"],
+            "stress_level": result["stress_level"],
+            "stress_probability": result["stress_probability"],
+            "stress_probabilities": json.dumps(result["raw"]),
+        }
+    if model == "drawing":
+        return {
+            "top1_label": result["top1"]["label"],
+            "top1_confidence": result["top1"]["confidence"],
+            "topk": json.dumps(result["topk"]),
+        }
+    return dict(result)
+
+
+def _error_message(e: Exception) -> str:
+    return str(getattr(e, "detail", None) or e)
+
+
+def score_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    model = _options["model"]
+    if model == "drawing":
+        rows = df[_options["image_column"]].tolist()
+    else:
+        rows = _records(df)
+
+    try:
+        results = _predict_rows(rows)
+    except Exception:
+        # Isolate the rows the model rejects; the rest of the chunk still scores
+        results = []
+        for row in rows:
+            try:
+                results.append(_predict_rows([row])[0])
+            except Exception as e:
+                results.append({"error": _error_message(e)})
+
+    columns = dict(OUTPUT_COLUMNS[model], error="object")
+    if model == "cognitive" and _options["explain"] == "none":
+        del columns["explainability"]
+    out = (
+        pd.DataFrame([_flatten(model, r) for r in results], index=df.index)
+        .reindex(columns=list(columns))
+        .astype(columns)
+    )
+    keep = _options.get("keep")
+    base = df[keep] if keep else df
+    return pd.concat([base, out], axis=1)
+
+
+# -------------------------------
+# Driver
+# -------------------------------
+
+def run(args) -> Dict[str, Any]:
+    input_path, output_path = Path(args.input), Path(args.output)
+    keep = [c.strip() for c in args.keep.split(",")] if args.keep else None
+    options = {
+        "top_k": args.top_k,
+        "explain": args.explain,
+        "image_column": args.image_column,
+        "keep": keep,
+        "single_threaded": args.workers > 1,
+    }
+
+    writer = ChunkWriter(output_path)
+    chunks = read_chunks(input_path, args.chunk_size)
+    t0 = time.perf_counter()
+    errors = 0
+
+    def report(df: pd.DataFrame):
+        nonlocal errors
+        writer.write(df)
+        errors += int(df["error"].notna().sum())
+        rate = writer.rows / max(time.perf_counter() - t0, 1e-9)
+        print(f"\r{writer.rows} rows scored ({rate:,.0f} rows/s, {errors} errors)", end="", file=sys.stderr, flush=True)
+
+    try:
+        if args.workers <= 1:
+            _init_worker(args.model, options)
+            for df in chunks:
+                report(score_chunk(df))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=_init_worker,
+                initargs=(args.model, options),
+            ) as pool:
+                # Bounded window of in-flight chunks, written back in input order
+                pending = deque()
+                for df in chunks:
+                    pending.append(pool.submit(score_chunk, df))
+                    if len(pending) >= 2 * args.workers:
+                        report(pending.popleft().result())
+                while pending:
+                    report(pending.popleft().result())
+    finally:
+        writer.close()
+        print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "model": args.model,
+        "input": str(input_path),
+        "output": str(output_path),
+        "rows": writer.rows,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(writer.rows / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", choices=MODELS)
+    parser.add_argument("input", help="CSV or Parquet file")
+    parser.add_argument("output", help="CSV or Parquet file (by extension); overwritten")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--keep", help="comma-separated input columns to copy to the output (default: all)")
+    parser.add_argument("--top-k", type=int, default=3, help="cognitive SHAP factors / drawing classes")
+    parser.add_argument("--explain", default="none", choices=("none", "sync"), help="cognitive: add SHAP factors")
+    parser.add_argument("--image-column", default="path", help="drawing: column with image file paths")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args)))
+
+
+if __name__ == "__main__":
+    main()
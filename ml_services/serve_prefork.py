@@ -0,0 +1,160 @@
+# serve_prefork.py
+"""
+Pre-fork serving: load every model once in a parent process, then fork
+uvicorn workers that share the loaded memory copy-on-write.
+
+Run from ml_services/:
+    python serve_prefork.py --workers 4 --port 8000
+
+Compared with `uvicorn main:app --workers N`, where every worker imports
+TensorFlow and loads the Keras model, the SHAP explainer, LightGBM and the
+TFLite interpreters on its own, the parent here loads and warms everything
+up once and then calls gc.freeze(), so the garbage collector never writes
+to (and un-shares) the model objects in the children. The TFLite
+flatbuffer is opened by path, which TFLite memory-maps, so every worker
+reads the same page-cache pages. `python -m benchmarks.bench_prefork`
+measures the difference.
+
+Workers share one listening socket. A worker that dies is re-forked from
+the parent, with no reload. SIGTERM / SIGINT stop all workers.
+
+Each request reaches an arbitrary worker, so state that lives in one
+process can't be addressed (main.py runs with PREFORK=1):
+  - explain=deferred is rejected (422): its token would only resolve in
+    the worker that issued it. Use explain=sync or none.
+  - POST /models/{name}/reload answers 409 and HOT_RELOAD is ignored, since
+    they would swap the model in one worker only. Restart this process to
+    roll out new artifacts.
+  - /metrics and the cache, batching and capture stats describe the worker
+    that answered; /models reports its pid.
+
+Use the default numpy engines (STRESS_ENGINE, ROUTINE_ENGINE):
+TensorFlow's and OpenMP's thread pools are not fork-safe. OMP_NUM_THREADS
+defaults to 1 here for that reason. The same goes for TFLite's CPU / XNNPACK
+thread pool: keep DRAWING_NUM_THREADS=1, since the parent's warmup would
+start the pool threads and they don't exist in the children.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Callable, Set
+
+# Before numpy / LightGBM are imported: libgomp's thread pool doesn't survive fork
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+# Before main is imported: turns off the per-process features (see above)
+os.environ["PREFORK"] = "1"
+
+
+def load_models():
+    """Import the app and load + warm up every model in this process."""
+    import main
+
+    status = main.registry.load_all()
+    failed = {name: s["error"] for name, s in status.items() if not s["ready"]}
+    if failed:
+        raise RuntimeError(f"❌ Models failed to load: {failed}")
+
+    for name in main.registry.names:
+        engine = getattr(main.registry.get(name), "engine", None)
+        if engine in ("keras", "tf_function"):
+            print(
+                f"⚠️ {name} uses the {engine} engine; TensorFlow calls in forked workers may hang",
+                file=sys.stderr,
+            )
+        pool = getattr(main.registry.get(name), "pool", None)
+        if (getattr(pool, "num_threads", None) or 1) > 1:
+            print(
+                f"⚠️ {name} runs TFLite with {pool.num_threads} threads; its thread pool (XNNPACK included) "
+                "was started by the warmup here and doesn't survive fork. Use DRAWING_NUM_THREADS=1",
+                file=sys.stderr,
+            )
+    if os.getenv("HOT_RELOAD", "0") == "1":
+        print("⚠️ HOT_RELOAD is ignored under serve_prefork.py; restart it to load new artifacts", file=sys.stderr)
+
+    # Move everything loaded so far out of the GC's reach: collections in the
+    # children would otherwise touch (and copy) every object header
+    gc.collect()
+    gc.freeze()
+    return main
+
+
+def fork_worker(target: Callable[[], None]) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            target()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def supervise(workers: int, target: Callable[[], None]):
+    """Fork `workers` children running target(); re-fork any that die until stopped."""
+    children: Set[int] = {fork_worker(target) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️ worker {pid} exited ({status}), re-forking", file=sys.stderr)
+            time.sleep(0.5)  # don't spin if workers crash on start
+            children.add(fork_worker(target))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    t0 = time.perf_counter()
+    server = load_models()
+    print(f"✅ Models loaded in {time.perf_counter() - t0:.1f}s, forking {args.workers} workers", file=sys.stderr)
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    sock.set_inheritable(True)
+
+    def run_worker():
+        config = uvicorn.Config(server.app, log_level=args.log_level, lifespan="on")
+        uvicorn.Server(config).run(sockets=[sock])
+
+    supervise(args.workers, run_worker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# services/batching.py
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+from services.metrics import metrics
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into one batched call.
+
+    Each `submit(item)` waits on a future. A single collector task per
+    batcher takes the first queued item, keeps collecting until
+    `max_batch_size` items or `max_wait_ms` have passed, then runs
+    `batch_fn(items)` on the executor and fans the results back out in
+    order. Up to `max_concurrency` batches run at once (size it to the
+    executor or interpreter pool); while all of them are busy, requests
+    keep queuing and the next batch is correspondingly larger.
+
+    If a batch raises, its items are re-run one by one, so a single bad
+    request only fails its own caller.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+        executor: Optional[Executor] = None,
+        max_concurrency: int = 1,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.executor = executor
+        self.max_concurrency = max(1, int(max_concurrency))
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running: set = set()
+
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "queue_depth": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._running),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+            "max_seen_batch": self.max_seen_batch,
+        }
+
+    def _ensure_worker(self):
+        # The queue and worker belong to the running loop; recreate them if
+        # the loop changed (e.g. test clients start a fresh loop)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._running = set()
+            self._worker = loop.create_task(self._run(), name=f"batcher-{self.name}")
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+
+        # Batching disabled: still keep the model call off the event loop
+        if self.max_batch_size == 1:
+            metrics.observe("ml_batch_size", 1, model=self.name)
+            results = await loop.run_in_executor(self.executor, self.batch_fn, [item])
+            return results[0]
+
+        self._ensure_worker()
+        fut = loop.create_future()
+        self._queue.put_nowait((item, fut))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        slots = self._slots
+        while True:
+            # Wait for a free slot first, so requests that arrive meanwhile
+            # join the next batch instead of waiting behind it
+            await slots.acquire()
+            batch = [await queue.get()]
+
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                # Take what is already queued first, then wait up to the deadline
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = loop.create_task(self._execute(batch), name=f"batch-{self.name}")
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _execute(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+
+        self.batches += 1
+        self.items += len(items)
+        self.max_seen_batch = max(self.max_seen_batch, len(items))
+        metrics.observe("ml_batch_size", len(items), model=self.name)
+
+        try:
+            results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+        except Exception as e:
+            if len(batch) == 1:
+                self._set(batch[0][1], exc=e)
+                return
+            # Isolate the failing request(s)
+            for item, fut in batch:
+                try:
+                    res = await loop.run_in_executor(self.executor, self.batch_fn, [item])
+                    self._set(fut, result=res[0])
+                except Exception as item_exc:
+                    self._set(fut, exc=item_exc)
+            return
+
+        for (_, fut), res in zip(batch, results):
+            self._set(fut, result=res)
+
+    @staticmethod
+    def _set(fut: asyncio.Future, result: Any = None, exc: Optional[BaseException] = None):
+        if fut.done():  # caller went away (cancelled)
+            return
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(result)
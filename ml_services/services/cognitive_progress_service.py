@@ -1,5 +1,9 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple, Union
 
 import joblib
 import numpy as np
@@ -7,9 +11,96 @@ import pandas as pd
 import shap
 from fastapi import HTTPException
 
+from services.feature_encoder import build_encoder, probe_rows_for, CompiledColumnEncoder
+from services.metrics import metrics
+from services.prediction_cache import LRUCache
+
+# none: prediction only, sync: SHAP in the response, deferred: SHAP computed
+# in the background and fetched later with get_explanation(token)
+EXPLAIN_MODES = ("none", "sync", "deferred")
+
+
+@dataclass(frozen=True)
+class FeatureSchema:
+    """Input/output schema of the fitted pipeline, built once at load."""
+
+    expected_columns: Tuple[str, ...]
+    expected_set: frozenset
+    column_index: Mapping[str, int]
+    categorical: Mapping[str, Tuple[Any, ...]]
+    numeric: Tuple[str, ...]
+    feature_names: np.ndarray  # encoded output names, read-only
+
+    def missing(self, features: Mapping[str, Any]) -> List[str]:
+        # Set difference first; only order the (rare) missing columns
+        missing = self.expected_set.difference(features)
+        if not missing:
+            return []
+        return sorted(missing, key=self.column_index.__getitem__)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "expected_columns": list(self.expected_columns),
+            "expected_count": len(self.expected_columns),
+            "categorical": {c: list(cats) for c, cats in self.categorical.items()},
+            "numeric": list(self.numeric),
+            "encoded_feature_names": self.feature_names.tolist(),
+            "encoded_feature_count": int(self.feature_names.shape[0]),
+        }
+
+
+class DeferredExplanations:
+    """
+    Deferred SHAP explanations: token -> (future of the SHAP matrix, row,
+    top_k, encoded feature names of the model that issued it).
+
+    Kept outside CognitiveProgressService so a hot reload, which swaps the
+    service instance, doesn't orphan the tokens already handed out: they
+    resolve against the version that computed them.
+    """
+
+    def __init__(self, workers: int = 1, max_entries: int = 10000, ttl_s: float = 600.0):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shap-deferred")
+        self._entries = LRUCache(max_entries=max_entries, ttl_s=ttl_s)
+
+    def submit(self, shap_fn, X_encoded, top_ks: List[int], feature_names: np.ndarray) -> List[str]:
+        """One background SHAP call for the rows of X_encoded; one token per row."""
+        fut = self._executor.submit(shap_fn, X_encoded)
+        tokens = []
+        for row, top_k in enumerate(top_ks):
+            token = uuid.uuid4().hex
+            self._entries.put(token, (fut, row, top_k, feature_names))
+            tokens.append(token)
+        return tokens
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Status of a deferred explanation, or None if the token is unknown/expired."""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        fut, row, top_k, feature_names = entry
+        if not fut.done():
+            return {"token": token, "status": "pending"}
+        try:
+            shap_values = fut.result()
+        except Exception as e:
+            return {"token": token, "status": "error", "detail": str(e)}
+        explanation = CognitiveProgressService._explain_factors(shap_values[row:row + 1], feature_names, [top_k])[0]
+        return {"token": token, "status": "done", "explainability": explanation}
+
 
 class CognitiveProgressService:
-    def __init__(self, model_path: Path):
+    def __init__(
+        self,
+        model_path: Path,
+        compile_features: bool = True,
+        deferred_workers: int = 1,
+        deferred_max_entries: int = 10000,
+        deferred_ttl_s: float = 600.0,
+        deferred: Optional[DeferredExplanations] = None,
+        cache_max_entries: int = 0,
+        cache_ttl_s: Optional[float] = 3600.0,
+    ):
         self.model_path = model_path
 
         try:
@@ -30,13 +121,43 @@ class CognitiveProgressService:
         except Exception as e:
             raise RuntimeError(f"❌ Failed to create SHAP explainer: {e}")
 
+        # Request dict -> encoded row without pandas (sklearn path as fallback)
+        self.encoder = None
+        self.encoder_error = None
+        if compile_features:
+            try:
+                probe = probe_rows_for(CompiledColumnEncoder(self.prep))
+                self.encoder = build_encoder(
+                    self.prep, probe, lambda rows: self.prep.transform(pd.DataFrame(list(rows)))
+                )
+            except Exception as e:
+                self.encoder_error = f"compiled features disabled, using sklearn: {e}"
+
+        self.schema = self._build_schema()
+        self._numeric = frozenset(self.schema.numeric)
+
+        # Memoized results keyed by the normalized features + model identity,
+        # so a retrained model never serves stale predictions
+        st = Path(self.model_path).stat()
+        self.model_identity = f"{Path(self.model_path).name}:{st.st_size}:{st.st_mtime_ns}"
+        self.cache = LRUCache(max_entries=cache_max_entries, ttl_s=cache_ttl_s)
+
+        # Pass a shared store so outstanding tokens survive a reload of this instance
+        self.deferred = deferred or DeferredExplanations(deferred_workers, deferred_max_entries, deferred_ttl_s)
+
     def health(self) -> Dict[str, Any]:
         return {
             "status": "ok",
             "model_loaded": True,
             "model_path": str(self.model_path),
+            "compiled_features": self.encoder is not None,
+            "compiled_features_error": self.encoder_error,
+            "cache": self.cache.stats(),
         }
 
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
     def _get_expected_input_columns(self) -> List[str]:
         cols = getattr(self.pipe, "feature_names_in_", None)
         return list(cols) if cols is not None else []
@@ -56,66 +177,255 @@ class CognitiveProgressService:
                 feature_names.extend(list(columns))
         return feature_names
 
-    def predict(self, features: Dict[str, Any], top_k: int = 10) -> Dict[str, Any]:
-        try:
-            X = pd.DataFrame([features])
-
-            # ✅ Validate schema
-            expected_cols = self._get_expected_input_columns()
-            if expected_cols:
-                missing_cols = [c for c in expected_cols if c not in X.columns]
-                if missing_cols:
-                    raise HTTPException(
-                        status_code=400,
-                        detail={
-                            "message": "columns are missing",
-                            "missing": missing_cols,
-                            "expected_count": len(expected_cols),
-                            "received_count": len(X.columns),
-                        },
-                    )
-
-            prediction = float(self.pipe.predict(X)[0])
-
-            # SHAP
-            X_encoded = self.prep.transform(X)
-            shap_values = self.explainer.shap_values(X_encoded)
-
-            # single row
-            shap_row = np.array(shap_values)[0]
-            feature_names = self._get_feature_names()
-
-            # Safety: mismatch guard
-            if len(feature_names) != len(shap_row):
-                # still return prediction even if explain fails cleanly
-                return {
-                    "predicted_score_next_14_days": prediction,
-                    "explainability": {
-                        "top_positive_factors": [],
-                        "top_negative_factors": [],
-                        "warning": "Feature-name length mismatch with SHAP output",
-                    },
+    def _build_schema(self) -> FeatureSchema:
+        expected = tuple(str(c) for c in self._get_expected_input_columns())
+
+        categorical: Dict[str, Tuple[Any, ...]] = {}
+        numeric: List[str] = []
+        for name, transformer, columns in self.prep.transformers_:
+            if name == "cat":
+                for col, cats in zip(columns, transformer.categories_):
+                    categorical[str(col)] = tuple(cats.tolist())
+            elif name == "num":
+                numeric.extend(str(c) for c in columns)
+
+        feature_names = np.array(self._get_feature_names(), dtype=object)
+        feature_names.setflags(write=False)
+
+        return FeatureSchema(
+            expected_columns=expected,
+            expected_set=frozenset(expected),
+            column_index=MappingProxyType({c: i for i, c in enumerate(expected)}),
+            categorical=MappingProxyType(categorical),
+            numeric=tuple(numeric),
+            feature_names=feature_names,
+        )
+
+    def describe_schema(self) -> Dict[str, Any]:
+        return self.schema.describe()
+
+    def sample_inputs(self, n: int = 1, seed: int = 0) -> List[Dict[str, Any]]:
+        """Synthetic feature dicts from the schema, cycling through the categories."""
+        rng = np.random.default_rng(seed)
+        rows = []
+        for i in range(n):
+            row: Dict[str, Any] = {}
+            for col in self.schema.expected_columns:
+                cats = self.schema.categorical.get(col)
+                row[col] = cats[i % len(cats)] if cats else float(rng.uniform(0.0, 10.0))
+            rows.append(row)
+        return rows
+
+    def warmup(self, rounds: int = 2):
+        # Model + TreeExplainer on single-row and small-batch shapes
+        # (bypasses the result cache)
+        for _ in range(rounds):
+            for n in (1, 8):
+                self._predict_rows(self.sample_inputs(n), [10] * n, ["sync"] * n)
+
+    def _validate(self, features: Dict[str, Any]):
+        # ✅ Validate schema
+        missing_cols = self.schema.missing(features)
+        if missing_cols:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "message": "columns are missing",
+                    "missing": missing_cols,
+                    "expected_count": len(self.schema.expected_columns),
+                    "received_count": len(features),
+                },
+            )
+
+    @staticmethod
+    def _top_abs_indices(shap_values: np.ndarray, k: int) -> np.ndarray:
+        """
+        Per-row indices of the k largest |SHAP| values, sorted descending.
+        argpartition selects the k candidates in O(F) per row, so only those
+        k are sorted instead of the whole row.
+        """
+        n_features = shap_values.shape[1]
+        k = max(0, min(k, n_features))
+        if k == 0:
+            return np.empty((shap_values.shape[0], 0), dtype=np.intp)
+
+        neg_abs = -np.abs(shap_values)
+        if k < n_features:
+            cand = np.argpartition(neg_abs, k - 1, axis=1)[:, :k]
+        else:
+            cand = np.broadcast_to(np.arange(n_features), shap_values.shape)
+        order = np.argsort(np.take_along_axis(neg_abs, cand, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(cand, order, axis=1)
+
+    def _shap(self, X_encoded) -> np.ndarray:
+        # One call for the whole matrix -> (N, F)
+        return np.asarray(self.explainer.shap_values(X_encoded))
+
+    @classmethod
+    def _explain_factors(
+        cls,
+        shap_values: np.ndarray,
+        feature_names: np.ndarray,
+        top_ks: List[int],
+    ) -> List[Dict[str, Any]]:
+        # Safety: mismatch guard
+        if shap_values.ndim != 2 or len(feature_names) != shap_values.shape[1]:
+            # still return prediction even if explain fails cleanly
+            return [
+                {
+                    "top_positive_factors": [],
+                    "top_negative_factors": [],
+                    "warning": "Feature-name length mismatch with SHAP output",
                 }
+                for _ in top_ks
+            ]
 
-            idx_sorted = np.argsort(np.abs(shap_row))[::-1][:top_k]
+        top_idx = cls._top_abs_indices(shap_values, max(top_ks, default=0))
+        top_vals = np.take_along_axis(shap_values, top_idx, axis=1)
+        top_names = feature_names[top_idx]
 
+        # One tolist() for the whole batch: the factors are dicts of Python
+        # floats, cheaper to build and encode than per-value NumPy scalars
+        explanations = []
+        for name_row, val_row, k in zip(top_names.tolist(), top_vals.tolist(), top_ks):
             factors = [
-                {"feature": feature_names[i], "shap_value": float(shap_row[i])}
-                for i in idx_sorted
+                {"feature": name, "shap_value": v}
+                for name, v in zip(name_row[:max(k, 0)], val_row)
             ]
 
             positive = [f for f in factors if f["shap_value"] > 0]
             negative = [f for f in factors if f["shap_value"] < 0]
 
-            return {
-                "predicted_score_next_14_days": prediction,
-                "explainability": {
-                    "top_positive_factors": positive,
-                    "top_negative_factors": negative,
-                },
-            }
+            explanations.append({
+                "top_positive_factors": positive,
+                "top_negative_factors": negative,
+            })
+        return explanations
+
+    def get_explanation(self, token: str) -> Optional[Dict[str, Any]]:
+        """Status of a deferred explanation, or None if the token is unknown/expired."""
+        return self.deferred.get(token)
+
+    def _cache_key(self, features: Mapping[str, Any], mode: str, top_k: int):
+        # Schema columns only, numerics as the encoder reads them (1 == 1.0 == "1");
+        # None when a value can't be normalized or hashed. Without known input
+        # columns (no feature_names_in_) every row would share one key: don't cache.
+        if not self.schema.expected_columns:
+            return None
+        try:
+            values = tuple(
+                float(features[c]) if c in self._numeric else features[c]
+                for c in self.schema.expected_columns
+            )
+            key = (self.model_identity, mode, top_k if mode == "sync" else None, values)
+            hash(key)
+            return key
+        except (TypeError, ValueError):
+            return None
+
+    def predict(self, features: Dict[str, Any], top_k: int = 10, explain: str = "sync") -> Dict[str, Any]:
+        return self.predict_batch([features], top_k=top_k, explain=explain)[0]
+
+    def predict_batch(
+        self,
+        features_list: List[Dict[str, Any]],
+        top_k: Union[int, Sequence[int]] = 10,
+        explain: Union[str, Sequence[str]] = "sync",
+    ) -> List[Dict[str, Any]]:
+        """
+        Predict and explain several rows with one model call and at most one
+        SHAP call. `top_k` and `explain` are either shared or given per row.
+        """
+        try:
+            with metrics.stage("cognitive", "validate"):
+                for row, features in enumerate(features_list):
+                    try:
+                        self._validate(features)
+                    except HTTPException as he:
+                        if len(features_list) > 1:
+                            he.detail["row"] = row
+                        raise
+
+            n = len(features_list)
+            top_ks = [top_k] * n if isinstance(top_k, int) else list(top_k)
+            modes = [explain] * n if isinstance(explain, str) else list(explain)
+            for mode in modes:
+                if mode not in EXPLAIN_MODES:
+                    raise ValueError(f"explain must be one of {EXPLAIN_MODES}, got {mode!r}")
+
+            # Seen rows are served from the cache; deferred results carry a
+            # one-off token and are never cached
+            results: List[Dict[str, Any]] = [None] * n
+            keys = [None] * n
+            pending = list(range(n))
+            if self.cache.enabled:
+                pending = []
+                for i, features in enumerate(features_list):
+                    if modes[i] != "deferred":
+                        keys[i] = self._cache_key(features, modes[i], top_ks[i])
+                    cached = self.cache.get(keys[i]) if keys[i] is not None else None
+                    if cached is not None:
+                        results[i] = cached
+                    else:
+                        pending.append(i)
+
+            if pending:
+                computed = self._predict_rows(
+                    [features_list[i] for i in pending],
+                    [top_ks[i] for i in pending],
+                    [modes[i] for i in pending],
+                )
+                for i, result in zip(pending, computed):
+                    results[i] = result
+                    if keys[i] is not None:
+                        self.cache.put(keys[i], result)
+            return results
 
         except HTTPException as he:
             raise he
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
+
+    def _predict_rows(
+        self,
+        features_list: List[Dict[str, Any]],
+        top_ks: List[int],
+        modes: List[str],
+    ) -> List[Dict[str, Any]]:
+        n = len(features_list)
+        # Encode once; the same matrix feeds the model and SHAP
+        with metrics.stage("cognitive", "encode"):
+            if self.encoder is not None:
+                X_encoded = self.encoder.encode_many(features_list)
+            else:
+                X_encoded = self.prep.transform(pd.DataFrame(features_list))
+
+        with metrics.stage("cognitive", "inference"):
+            predictions = self.model.predict(X_encoded)
+        results = [
+            {"predicted_score_next_14_days": float(pred), "explainability": None}
+            for pred in predictions
+        ]
+
+        # SHAP reuses the encoded rows; nothing is transformed twice
+        sync_rows = [i for i, m in enumerate(modes) if m == "sync"]
+        if sync_rows:
+            X_sync = X_encoded if len(sync_rows) == n else X_encoded[sync_rows]
+            with metrics.stage("cognitive", "shap"):
+                shap_values = self._shap(X_sync)
+            with metrics.stage("cognitive", "postprocess"):
+                explanations = self._explain_factors(
+                    shap_values, self.schema.feature_names, [top_ks[i] for i in sync_rows]
+                )
+            for i, explanation in zip(sync_rows, explanations):
+                results[i]["explainability"] = explanation
+
+        deferred_rows = [i for i, m in enumerate(modes) if m == "deferred"]
+        if deferred_rows:
+            tokens = self.deferred.submit(
+                self._shap, X_encoded[deferred_rows], [top_ks[i] for i in deferred_rows], self.schema.feature_names
+            )
+            for i, token in zip(deferred_rows, tokens):
+                results[i]["explanation_token"] = token
+
+        return results
@@ -0,0 +1,80 @@
+# services/dense_forward.py
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0.0, out=x)
+
+
+def _softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+ACTIVATIONS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "softmax": _softmax,
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+}
+
+# Layers that are the identity at inference time
+PASSTHROUGH_LAYERS = {"InputLayer", "Dropout", "GaussianNoise", "GaussianDropout", "ActivityRegularization"}
+
+
+class NumpyDenseForward:
+    """
+    Inference-only forward pass for a Keras Sequential model made of Dense
+    layers, evaluated with plain NumPy in float32.
+    Raises ValueError at build time if the model uses anything else, so the
+    caller can fall back to Keras.
+    """
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray, str]]):
+        if not layers:
+            raise ValueError("Model has no Dense layers")
+        self.layers = layers
+        self.n_features = layers[0][0].shape[0]
+
+    @classmethod
+    def from_keras(cls, model) -> "NumpyDenseForward":
+        layers = []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            if kind in PASSTHROUGH_LAYERS:
+                continue
+            if kind != "Dense":
+                raise ValueError(f"Unsupported layer for NumPy engine: {kind} ({layer.name})")
+
+            activation = layer.get_config().get("activation", "linear")
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation for NumPy engine: {activation} ({layer.name})")
+
+            weights = layer.get_weights()
+            kernel = np.ascontiguousarray(weights[0], dtype=np.float32)
+            bias = (
+                np.asarray(weights[1], dtype=np.float32)
+                if len(weights) > 1
+                else np.zeros(kernel.shape[1], dtype=np.float32)
+            )
+            layers.append((kernel, bias, activation))
+        return cls(layers)
+
+    def __call__(self, X: np.ndarray) -> np.ndarray:
+        h = np.asarray(X, dtype=np.float32)
+        if h.ndim == 1:
+            h = h[None, :]
+        for kernel, bias, activation in self.layers:
+            h = h @ kernel
+            h += bias
+            h = ACTIVATIONS[activation](h)
+        return h
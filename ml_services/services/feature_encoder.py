@@ -0,0 +1,210 @@
+# services/feature_encoder.py
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+class UnsupportedTransformerError(ValueError):
+    pass
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+class CompiledColumnEncoder:
+    """
+    Pre-compiled replacement for a fitted sklearn ColumnTransformer.
+
+    At build time every transformer is turned into plain index maps and
+    coefficient arrays, so encoding a request dict is a few dict lookups and
+    one vectorized scale, with no pandas DataFrame and no sklearn dispatch.
+
+    Supported: StandardScaler, OneHotEncoder (no drop / infrequent
+    categories), identity FunctionTransformer, "passthrough" and "drop".
+    Anything else raises UnsupportedTransformerError so the caller can keep
+    the sklearn path.
+    """
+
+    def __init__(self, column_transformer):
+        ct = column_transformer
+        if not hasattr(ct, "transformers_"):
+            raise UnsupportedTransformerError("ColumnTransformer is not fitted")
+
+        self.input_columns: List[str] = (
+            [str(c) for c in ct.feature_names_in_] if hasattr(ct, "feature_names_in_") else []
+        )
+
+        # Numeric output slots: value = (x - offset) / scale
+        num_cols: List[str] = []
+        num_out: List[int] = []
+        num_offset: List[float] = []
+        num_scale: List[float] = []
+        # One-hot: column -> (category -> output index), plus unknown policy
+        self.onehot: List[tuple] = []  # (column, {category: out_idx}, raise_unknown)
+
+        out = 0
+        for name, transformer, columns in ct.transformers_:
+            if transformer == "drop" or (name == "remainder" and not len(columns)):
+                continue
+            columns = self._resolve_columns(columns)
+
+            if transformer == "passthrough" or self._is_identity(transformer):
+                for c in columns:
+                    num_cols.append(c)
+                    num_out.append(out)
+                    num_offset.append(0.0)
+                    num_scale.append(1.0)
+                    out += 1
+
+            elif type(transformer).__name__ == "StandardScaler":
+                mean = getattr(transformer, "mean_", None)
+                scale = getattr(transformer, "scale_", None)
+                for j, c in enumerate(columns):
+                    num_cols.append(c)
+                    num_out.append(out)
+                    num_offset.append(float(mean[j]) if mean is not None else 0.0)
+                    num_scale.append(float(scale[j]) if scale is not None else 1.0)
+                    out += 1
+
+            elif type(transformer).__name__ == "OneHotEncoder":
+                if getattr(transformer, "drop_idx_", None) is not None:
+                    raise UnsupportedTransformerError("OneHotEncoder with drop is not supported")
+                if getattr(transformer, "_infrequent_enabled", False):
+                    raise UnsupportedTransformerError("OneHotEncoder with infrequent categories is not supported")
+                raise_unknown = transformer.handle_unknown == "error"
+                for c, cats in zip(columns, transformer.categories_):
+                    index = {cat: out + k for k, cat in enumerate(cats.tolist())}
+                    self.onehot.append((c, index, raise_unknown))
+                    out += len(cats)
+
+            else:
+                raise UnsupportedTransformerError(
+                    f"Unsupported transformer {name!r}: {type(transformer).__name__}"
+                )
+
+        self.n_features_out = out
+        self.num_cols = num_cols
+        self.num_out = np.asarray(num_out, dtype=np.intp)
+        self.num_offset = np.asarray(num_offset, dtype=np.float64)
+        # StandardScaler stores scale_=1 for constant columns, so no zeros here
+        self.num_scale = np.asarray(num_scale, dtype=np.float64)
+
+    def _resolve_columns(self, columns) -> List[str]:
+        cols = list(columns) if not isinstance(columns, (str, int)) else [columns]
+        if cols and not isinstance(cols[0], str):
+            # integer positions / boolean mask into feature_names_in_
+            if not self.input_columns:
+                raise UnsupportedTransformerError("Positional columns without feature_names_in_")
+            arr = np.asarray(cols)
+            if arr.dtype == bool:
+                arr = np.flatnonzero(arr)
+            cols = [self.input_columns[int(i)] for i in arr]
+        return [str(c) for c in cols]
+
+    @staticmethod
+    def _is_identity(transformer) -> bool:
+        return (
+            type(transformer).__name__ == "FunctionTransformer"
+            and transformer.func is None
+        )
+
+    def encode_many(self, rows: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        X = np.zeros((len(rows), self.n_features_out), dtype=np.float64)
+
+        if self.num_cols:
+            num = np.array(
+                [[float(r[c]) for c in self.num_cols] for r in rows],
+                dtype=np.float64,
+            ).reshape(len(rows), len(self.num_cols))
+            num -= self.num_offset
+            num /= self.num_scale
+            X[:, self.num_out] = num
+
+        for c, index, raise_unknown in self.onehot:
+            for i, r in enumerate(rows):
+                value = r[c]
+                j = None if _is_missing(value) else index.get(value)
+                if j is not None:
+                    X[i, j] = 1.0
+                elif raise_unknown:
+                    raise ValueError(f"Found unknown category {value!r} in column {c!r} during transform")
+
+        return X
+
+    def encode(self, row: Mapping[str, Any]) -> np.ndarray:
+        return self.encode_many([row])
+
+
+def build_encoder(
+    column_transformer,
+    probe_rows: Optional[Sequence[Mapping[str, Any]]] = None,
+    reference: Optional[Callable[[Sequence[Mapping[str, Any]]], np.ndarray]] = None,
+    atol: float = 1e-9,
+) -> CompiledColumnEncoder:
+    """
+    Compile `column_transformer` and, if probe rows and a reference
+    transform are given, check that both produce the same matrix.
+    Raises UnsupportedTransformerError when the compiled encoder can't be used.
+    """
+    encoder = CompiledColumnEncoder(column_transformer)
+    if probe_rows and reference is not None:
+        expected = reference(probe_rows)
+        if hasattr(expected, "toarray"):
+            expected = expected.toarray()
+        got = encoder.encode_many(probe_rows)
+        expected = np.asarray(expected, dtype=np.float64)
+        if got.shape != expected.shape or not np.allclose(got, expected, rtol=0.0, atol=atol):
+            raise UnsupportedTransformerError("Compiled encoder output differs from sklearn transform")
+    return encoder
+
+
+def probe_rows_for(encoder: CompiledColumnEncoder) -> List[Dict[str, Any]]:
+    """One synthetic row per category position, covering every one-hot slot."""
+    width = max([len(index) for _, index, _ in encoder.onehot] or [1])
+    rows = []
+    for k in range(width):
+        row: Dict[str, Any] = {c: float(k + 1) * 1.5 for c in encoder.num_cols}
+        for c, index, _ in encoder.onehot:
+            cats = list(index.keys())
+            row[c] = cats[k % len(cats)]
+        rows.append(row)
+    return rows
+
+
+class LabelLookup:
+    """Dict-based stand-in for a fitted sklearn LabelEncoder."""
+
+    def __init__(self, label_encoder):
+        self.classes_ = np.asarray(label_encoder.classes_)
+        self._index = {cls: i for i, cls in enumerate(self.classes_.tolist())}
+
+    def encode(self, value: Any) -> int:
+        try:
+            return self._index[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"y contains previously unseen labels: {value!r}")
+
+    def decode(self, idx: int):
+        if not 0 <= idx < len(self.classes_):
+            raise ValueError(f"y contains previously unseen labels: [{idx}]")
+        return self.classes_[idx]
+
+    def encode_many(self, values: Sequence[Any]) -> np.ndarray:
+        """Encode a whole column; unseen labels are all reported in one error."""
+        try:
+            codes = np.fromiter(map(self._index.get, values, repeat(-1)), dtype=np.intp, count=len(values))
+        except TypeError:
+            raise ValueError(f"y contains previously unseen labels: {[v for v in values if not isinstance(v, str)][:5]!r}")
+        if (codes < 0).any():
+            unseen = sorted({str(values[i]) for i in np.flatnonzero(codes < 0)})
+            raise ValueError(f"y contains previously unseen labels: {unseen!r}")
+        return codes
+
+    def decode_many(self, idx: np.ndarray) -> np.ndarray:
+        idx = np.asarray(idx, dtype=np.intp)
+        bad = (idx < 0) | (idx >= len(self.classes_))
+        if bad.any():
+            raise ValueError(f"y contains previously unseen labels: {idx[bad].tolist()!r}")
+        return self.classes_[idx]
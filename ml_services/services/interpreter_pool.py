@@ -0,0 +1,100 @@
+# services/interpreter_pool.py
+import queue
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import tensorflow as tf
+
+
+class PooledInterpreter:
+    """
+    One tf.lite.Interpreter plus its cached tensor details.
+    A TFLite interpreter is not thread-safe, so each instance must only be
+    used by one thread at a time (the pool guarantees this).
+
+    xnnpack=False builds the interpreter without TFLite's default XNNPACK
+    delegate, i.e. with the plain builtin kernels.
+    """
+
+    def __init__(self, model_path: Path, num_threads: Optional[int] = None, xnnpack: bool = True):
+        resolver = tf.lite.experimental.OpResolverType
+        self.interpreter = tf.lite.Interpreter(
+            model_path=str(model_path),
+            num_threads=num_threads,
+            experimental_op_resolver_type=resolver.AUTO if xnnpack else resolver.BUILTIN_WITHOUT_DEFAULT_DELEGATES,
+        )
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.batch_size = int(self.input_details[0]["shape"][0])
+
+    def _ensure_batch_size(self, n: int):
+        # Resize the input tensor to [n,H,W,3] only when the batch size changes,
+        # so repeated batches of the same size reuse the allocated arena.
+        if n == self.batch_size:
+            return
+        shape = [n, *self.input_details[0]["shape"][1:]]
+        self.interpreter.resize_tensor_input(self.input_details[0]["index"], shape)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.batch_size = n
+
+    def invoke(self, x: np.ndarray) -> np.ndarray:
+        self._ensure_batch_size(x.shape[0])
+        self.interpreter.set_tensor(self.input_details[0]["index"], x)
+        self.interpreter.invoke()
+        # copy: the returned tensor buffer is reused by the next invoke
+        return self.interpreter.get_tensor(self.output_details[0]["index"]).copy()
+
+
+class InterpreterPool:
+    """
+    Bounded pool of pre-allocated interpreters for the same model.
+    `acquire()` blocks until an interpreter is free, so at most `size`
+    inferences run at once.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        size: int = 2,
+        num_threads: Optional[int] = None,
+        xnnpack: bool = True,
+    ):
+        self.model_path = Path(model_path)
+        self.size = max(1, int(size))
+        self.num_threads = num_threads
+        self.xnnpack = xnnpack
+
+        self._free: "queue.Queue[PooledInterpreter]" = queue.Queue(maxsize=self.size)
+        for _ in range(self.size):
+            self._free.put(PooledInterpreter(self.model_path, num_threads=num_threads, xnnpack=xnnpack))
+
+    @property
+    def available(self) -> int:
+        return self._free.qsize()
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        try:
+            interp = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free TFLite interpreter after {timeout}s")
+        try:
+            yield interp
+        finally:
+            self._free.put(interp)
+
+    def warmup(self):
+        """Run one zero input through every interpreter (arena + delegate setup)."""
+        held = [self._free.get() for _ in range(self.size)]
+        try:
+            for interp in held:
+                detail = interp.input_details[0]
+                interp.invoke(np.zeros(detail["shape"], dtype=detail["dtype"]))
+        finally:
+            for interp in held:
+                self._free.put(interp)
@@ -0,0 +1,374 @@
+# services/job_queue.py
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from services.metrics import SIZE_BUCKETS, metrics
+from services.serialization import dumps, loads
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+FINISHED = (DONE, ERROR)
+
+log = logging.getLogger(__name__)
+
+# At most one warning per interval from a failing worker loop; stats() has the rest
+_ERROR_LOG_INTERVAL_S = 60.0
+
+metrics.define("ml_job_batch_size", "Jobs per batched model call", SIZE_BUCKETS)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    result      TEXT,
+    error       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    lease_until REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+"""
+
+
+class QueueFull(Exception):
+    def __init__(self, pending: int, limit: int):
+        super().__init__(f"{pending} jobs pending (limit {limit})")
+        self.pending = pending
+        self.limit = limit
+
+
+class JobStore:
+    """
+    Jobs persisted in a SQLite database in WAL mode, so pollers read while
+    a worker writes, and several processes (serve_prefork.py workers) can
+    share one file. Each thread gets its own connection, opened on first
+    use, which also keeps connections out of forked children.
+
+    A claimed job is leased for `lease_s`; if its worker dies, the job is
+    claimed again once the lease expires, up to `max_attempts` times.
+    """
+
+    def __init__(self, path: Path, lease_s: float = 300.0, max_attempts: int = 3):
+        self.path = Path(path)
+        self.lease_s = lease_s
+        self.max_attempts = max(1, int(max_attempts))
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; writes that must be atomic use BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def pending(self) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchone()[0]
+
+    def submit(self, model: str, payloads: Sequence[Any], max_pending: Optional[int] = None) -> List[str]:
+        now = time.time()
+        rows = [(uuid.uuid4().hex, model, QUEUED, dumps(p).decode("utf-8"), now) for p in payloads]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if max_pending is not None:
+                pending = self.pending()
+                if pending + len(rows) > max_pending:
+                    raise QueueFull(pending, max_pending)
+            conn.executemany(
+                "INSERT INTO jobs (id, model, status, payload, created_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [r[0] for r in rows]
+
+    def claim(self, max_jobs: int, models: Optional[Sequence[str]] = None) -> tuple:
+        """
+        Claim up to `max_jobs` jobs of one model: the model of the oldest
+        claimable job. Returns (model, [(id, attempt, payload), ...]);
+        (None, []) when nothing is waiting. The attempt number identifies
+        this claim in finish().
+        """
+        now = time.time()
+        conn = self._conn()
+        # Idle polls only read (WAL readers don't block writers); the write
+        # lock is taken only when there is something to claim or requeue
+        if conn.execute(
+            "SELECT 1 FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) LIMIT 1",
+            (QUEUED, RUNNING, now),
+        ).fetchone() is None:
+            return None, []
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose worker died: give up after max_attempts, otherwise requeue
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (ERROR, f"Abandoned after {self.max_attempts} attempts", now, RUNNING, now, self.max_attempts),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ? AND lease_until < ?", (QUEUED, RUNNING, now)
+            )
+
+            model_filter, params = "", [QUEUED]
+            if models is not None:
+                model_filter = f" AND model IN ({','.join('?' * len(models))})"
+                params += list(models)
+            row = conn.execute(
+                f"SELECT model FROM jobs WHERE status = ?{model_filter} ORDER BY created_at LIMIT 1", params
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None, []
+            model = row[0]
+
+            jobs = conn.execute(
+                "SELECT id, attempts + 1, payload FROM jobs "
+                "WHERE status = ? AND model = ? ORDER BY created_at LIMIT ?",
+                (QUEUED, model, max_jobs),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = ?, lease_until = ? WHERE id = ?",
+                [(RUNNING, attempt, now + self.lease_s, job_id) for job_id, attempt, _ in jobs],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return model, [(job_id, attempt, loads(payload)) for job_id, attempt, payload in jobs]
+
+    def finish(self, outcomes: Sequence[tuple]):
+        """outcomes: (id, attempt, result, error) with exactly one of result / error set."""
+        now = time.time()
+        rows = [
+            (ERROR if error is not None else DONE,
+             dumps(result).decode("utf-8") if error is None else None,
+             error, now, job_id, RUNNING, attempt)
+            for job_id, attempt, result, error in outcomes
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Only jobs still running this claim: a lease that expired meanwhile
+            # may have been reclaimed (attempt + 1), or abandoned
+            conn.executemany(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        conn = self._conn()
+        # SQLite caps bound parameters per statement
+        for start in range(0, len(ids), 500):
+            chunk = list(ids[start:start + 500])
+            rows = conn.execute(
+                "SELECT id, model, status, result, error, attempts, created_at, finished_at "
+                f"FROM jobs WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for job_id, model, status, result, error, attempts, created_at, finished_at in rows:
+                found[job_id] = {
+                    "job_id": job_id,
+                    "model": model,
+                    "status": status,
+                    "result": loads(result) if result is not None else None,
+                    "error": error,
+                    "attempts": attempts,
+                    "created_at": created_at,
+                    "finished_at": finished_at,
+                }
+        return found
+
+    def purge(self, older_than_s: float) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (*FINISHED, time.time() - older_than_s),
+        )
+        return cur.rowcount
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        out: Dict[str, Dict[str, int]] = {}
+        for model, status, n in self._conn().execute(
+            "SELECT model, status, COUNT(*) FROM jobs GROUP BY model, status"
+        ):
+            out.setdefault(model, {})[status] = n
+        return out
+
+
+class JobWorkers:
+    """
+    Background threads that drain a JobStore. Each round a worker claims
+    up to `max_batch_size` queued jobs of one model (the model of the oldest
+    waiting job), runs `handlers[model](payloads)` once for all of them and
+    writes the results back in one transaction. Jobs pile up while the
+    workers are busy, so batches grow with the load.
+
+    As in MicroBatcher, a batch that raises is re-run one job at a time, so
+    a bad payload only fails its own job.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handlers: Dict[str, Callable[[List[Any]], List[Any]]],
+        workers: int = 2,
+        max_batch_size: int = 64,
+        poll_interval_s: float = 0.1,
+        retention_s: float = 86400.0,
+    ):
+        self.store = store
+        self.handlers = handlers
+        self.workers = max(1, int(workers))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.poll_interval_s = poll_interval_s
+        self.retention_s = retention_s
+
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._last_purge = 0.0
+
+        self.batches = 0
+        self.jobs = 0
+        self.failed = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self._error_logged_at = float("-inf")
+
+    def notify(self):
+        # Called after a submit; workers in other processes find it on their next poll
+        self._wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "alive": sum(t.is_alive() for t in self._threads),
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "avg_batch_size": (self.jobs / self.batches) if self.batches else 0.0,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+    def start(self):
+        if any(t.is_alive() for t in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _loop(self):
+        backoff = 0.0
+        try:
+            while not self._stop.is_set():
+                try:
+                    busy = self.run_once()
+                    self._maybe_purge()
+                    backoff = 0.0
+                except Exception as e:
+                    # e.g. "database is locked": keep the worker alive, retry later.
+                    # Claimed jobs are picked up again when their lease expires.
+                    self.errors += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    backoff = min(max(2 * backoff, self.poll_interval_s), 30.0)
+                    now = time.monotonic()
+                    if now - self._error_logged_at >= _ERROR_LOG_INTERVAL_S:
+                        self._error_logged_at = now
+                        log.warning("%s: %s, retrying in %.1fs (%d errors so far)",
+                                    threading.current_thread().name, self.last_error, backoff, self.errors)
+                    self._stop.wait(backoff)
+                    continue
+                if not busy:
+                    self._wake.wait(self.poll_interval_s)
+                    self._wake.clear()
+        finally:
+            self.store.close()
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge >= 60.0:
+            self._last_purge = now
+            self.store.purge(self.retention_s)
+
+    def run_once(self) -> bool:
+        """Claim and run one batch. False when there was nothing to do."""
+        model, jobs = self.store.claim(self.max_batch_size, models=list(self.handlers))
+        if not jobs:
+            return False
+
+        self.batches += 1
+        self.jobs += len(jobs)
+        metrics.observe("ml_job_batch_size", len(jobs), model=model)
+        self.store.finish(self._execute(model, jobs))
+        return True
+
+    def _execute(self, model: str, jobs: List[tuple]) -> List[tuple]:
+        handler = self.handlers[model]
+        payloads = [p for _, _, p in jobs]
+        try:
+            with metrics.stage(model, "job"):
+                results = handler(payloads)
+            if len(results) != len(jobs):
+                raise RuntimeError(f"❌ {model} handler returned {len(results)} results for {len(jobs)} jobs")
+            return [(job_id, attempt, r, None) for (job_id, attempt, _), r in zip(jobs, results)]
+        except Exception as e:
+            if len(jobs) == 1:
+                return [self._failed(jobs[0], e)]
+        return [self._run_one(handler, job) for job in jobs]
+
+    def _run_one(self, handler, job) -> tuple:
+        job_id, attempt, payload = job
+        try:
+            results = handler([payload])
+            if len(results) != 1:
+                raise RuntimeError(f"❌ Handler returned {len(results)} results for 1 job")
+            return job_id, attempt, results[0], None
+        except Exception as e:
+            return self._failed(job, e)
+
+    def _failed(self, job: tuple, e: Exception) -> tuple:
+        self.failed += 1
+        # HTTPException detail (validation errors) or the exception message
+        detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+        return job[0], job[1], None, detail if isinstance(detail, str) else dumps(detail).decode("utf-8")
@@ -0,0 +1,183 @@
+# services/metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+    from services.metrics import metrics
+
+    with metrics.stage("stress", "inference"):
+        ...
+    metrics.observe("ml_batch_size", len(items), model="stress")
+
+With METRICS_ENABLED=0 every call returns immediately (stage() hands back a
+shared no-op context manager), so instrumented code costs next to nothing.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_NOOP = nullcontext()
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _StageTimer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist: Histogram):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+
+def _fmt_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._help: Dict[str, str] = {}
+        self._bucket_defs: Dict[str, Tuple[float, ...]] = {}
+        self._hists: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]]] = {}
+        self._lock = threading.Lock()
+
+        self.define("ml_request_seconds", "HTTP request latency by route", LATENCY_BUCKETS)
+        self.define("ml_stage_seconds", "Time spent per prediction stage", LATENCY_BUCKETS)
+        self.define("ml_batch_size", "Rows per batched model call", SIZE_BUCKETS)
+
+    def define(self, name: str, help_text: str, buckets: Iterable[float]):
+        self._help[name] = help_text
+        self._bucket_defs[name] = tuple(buckets)
+
+    def _hist(self, name: str, labels: Tuple[Tuple[str, str], ...]) -> Histogram:
+        key = (name, labels)
+        hist = self._hists.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(key, Histogram(self._bucket_defs.get(name, LATENCY_BUCKETS)))
+        return hist
+
+    def observe(self, name: str, value: float, **labels: str):
+        if not self.enabled:
+            return
+        self._hist(name, tuple(sorted(labels.items()))).observe(value)
+
+    def stage(self, model: str, stage: str):
+        """Context manager timing one stage of a model's predict path."""
+        if not self.enabled:
+            return _NOOP
+        return _StageTimer(self._hist("ml_stage_seconds", (("model", model), ("stage", stage))))
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+        """Register a gauge evaluated only at scrape time: fn() -> {labels: value}."""
+        self._gauges[name] = (help_text, fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        by_name: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], Histogram]]] = {}
+        with self._lock:
+            items = list(self._hists.items())
+        for (name, labels), hist in items:
+            by_name.setdefault(name, []).append((labels, hist))
+
+        for name in sorted(by_name):
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in sorted(by_name[name], key=lambda x: x[0]):
+                counts, total, count = hist.snapshot()
+                cumulative = 0
+                for bound, c in zip(hist.buckets, counts):
+                    cumulative += c
+                    le = 'le="%s"' % bound
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, le)} {cumulative}")
+                inf = 'le="+Inf"'
+                lines.append(f"{name}_bucket{_fmt_labels(labels, inf)} {count}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {total}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+
+        for name in sorted(self._gauges):
+            help_text, fn = self._gauges[name]
+            try:
+                values = fn()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording ml_request_seconds{route,method,status}."""
+
+    def __init__(self, app, registry: Optional[Metrics] = None):
+        self.app = app
+        self.metrics = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.metrics.enabled:
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            # Route template (e.g. /explanations/{token}) keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", None)
+            if route is None:
+                endpoint = scope.get("endpoint")
+                route = getattr(endpoint, "__name__", "unmatched")
+            self.metrics.observe(
+                "ml_request_seconds",
+                time.perf_counter() - t0,
+                route=route,
+                method=scope.get("method", ""),
+                status=str(status[0]),
+            )
+
+
+metrics = Metrics(enabled=os.getenv("METRICS_ENABLED", "1") == "1")
@@ -0,0 +1,271 @@
+# services/model_registry.py
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Model states reported on the health routes
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+def _artifact_files(paths: Iterable[Path]) -> List[Path]:
+    files = []
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            files.extend(sorted(f for f in p.iterdir() if f.is_file()))
+        elif p.exists():
+            files.append(p)
+    return files
+
+
+def fingerprint(paths: Iterable[Path], checksum: bool = False) -> str:
+    """
+    Short identity of a set of artifact files/directories.
+    mtime mode hashes (name, size, mtime_ns); checksum mode hashes contents.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for f in _artifact_files(paths):
+        h.update(f.name.encode())
+        if checksum:
+            with open(f, "rb") as fh:
+                for block in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(block)
+        else:
+            st = f.stat()
+            h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+class _Entry:
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        watch_paths: List[Path],
+        warmup: Optional[Callable[[Any], Any]],
+    ):
+        self.name = name
+        self.factory = factory
+        self.watch_paths = watch_paths
+        self.warmup = warmup
+        self.lock = threading.Lock()
+        # Serializes reloads (fingerprint, build, activate) without blocking get()
+        self.reload_lock = threading.Lock()
+        self.instance: Any = None
+        self.state = NOT_LOADED
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+        # Versioning for hot reload
+        self.version = 0
+        self.fingerprint: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self.pending_fingerprint: Optional[str] = None
+        # Artifacts whose reload failed; the watcher doesn't retry them
+        self.failed_fingerprint: Optional[str] = None
+        self.reload_error: Optional[str] = None
+
+
+class ModelRegistry:
+    """
+    Owns the service instances of the model server.
+
+    Each model is registered with a zero-argument factory that imports its
+    framework and loads its artifacts. Nothing is loaded at registration:
+      - `get(name)` loads the model on first use (lazy mode)
+      - `load_all()` loads every model concurrently in a thread pool
+        (eager mode, called from the FastAPI lifespan)
+    A model that failed to load is retried on the next `get`.
+
+    With `start_watcher()`, the artifact paths of each loaded model are
+    polled; when they change (and stay unchanged for one more poll, so
+    half-copied files are skipped) a new instance is built and warmed up in
+    the background, then swapped in. Requests that already hold the old
+    instance finish on it.
+    """
+
+    def __init__(self, checksum: bool = False):
+        self._entries: Dict[str, _Entry] = {}
+        self.checksum = checksum
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        watch_paths: Iterable[Path] = (),
+        warmup: Optional[Callable[[Any], Any]] = None,
+    ):
+        self._entries[name] = _Entry(name, factory, [Path(p) for p in watch_paths], warmup)
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def _load(self, entry: _Entry):
+        with entry.lock:
+            if entry.state == READY:
+                return entry.instance
+            entry.state = LOADING
+            t0 = time.perf_counter()
+            try:
+                fp = fingerprint(entry.watch_paths, self.checksum)
+                instance = self._build(entry)
+            except Exception as e:
+                entry.state = FAILED
+                entry.error = str(e)
+                raise
+            entry.load_seconds = time.perf_counter() - t0
+            self._activate(entry, instance, fp)
+            entry.error = None
+            entry.state = READY
+            return instance
+
+    def _build(self, entry: _Entry):
+        instance = entry.factory()
+        if entry.warmup is not None:
+            # Runs before the instance is published, so the model only reports
+            # ready (or gets swapped in) once its first-call costs are paid
+            t0 = time.perf_counter()
+            entry.warmup(instance)
+            entry.warmup_seconds = time.perf_counter() - t0
+        return instance
+
+    def _activate(self, entry: _Entry, instance: Any, fp: str):
+        # A single attribute assignment: readers see either the old or the
+        # new instance, never a half-built one
+        entry.instance = instance
+        entry.version += 1
+        entry.fingerprint = fp
+        entry.loaded_at = time.time()
+        entry.pending_fingerprint = None
+
+    def reload(self, name: str, changed_only: bool = False) -> bool:
+        """
+        Build a new instance from the current artifacts and swap it in.
+
+        Reloads of one model run one at a time, so the watcher and a manual
+        reload can't publish builds out of order. With `changed_only`, a
+        reload whose artifacts were already loaded (or already failed) by
+        the time it gets the lock is skipped and returns False.
+        """
+        entry = self._entries[name]
+        with entry.reload_lock:
+            fp = fingerprint(entry.watch_paths, self.checksum)
+            if changed_only and fp in (entry.fingerprint, entry.failed_fingerprint):
+                entry.pending_fingerprint = None
+                return False
+            t0 = time.perf_counter()
+            try:
+                instance = self._build(entry)
+            except Exception as e:
+                # keep serving the previous version
+                entry.reload_error = f"{type(e).__name__}: {e}"
+                entry.pending_fingerprint = None
+                # fingerprint keeps naming the version that is still served
+                entry.failed_fingerprint = fp
+                return False
+            with entry.lock:
+                entry.load_seconds = time.perf_counter() - t0
+                self._activate(entry, instance, fp)
+                entry.reload_error = None
+                entry.failed_fingerprint = None
+                entry.error = None
+                entry.state = READY
+            return True
+
+    def check_for_updates(self) -> List[str]:
+        """One watcher poll; returns the names of models that were swapped."""
+        swapped = []
+        for name, entry in self._entries.items():
+            if entry.state != READY or not entry.watch_paths:
+                continue
+            try:
+                fp = fingerprint(entry.watch_paths, self.checksum)
+            except OSError:
+                continue  # file being replaced right now
+            if fp in (entry.fingerprint, entry.failed_fingerprint):
+                entry.pending_fingerprint = None
+                continue
+            if fp != entry.pending_fingerprint:
+                entry.pending_fingerprint = fp  # wait one more poll for writes to settle
+                continue
+            if self.reload(name, changed_only=True):
+                swapped.append(name)
+        return swapped
+
+    def start_watcher(self, interval_s: float = 5.0):
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(interval_s):
+                self.check_for_updates()
+
+        self._watcher = threading.Thread(target=_loop, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def get(self, name: str) -> Any:
+        entry = self._entries[name]
+        if entry.state == READY:
+            return entry.instance
+        return self._load(entry)
+
+    async def aget(self, name: str) -> Any:
+        """`get` for async routes: a cold load runs off the event loop."""
+        entry = self._entries[name]
+        if entry.state == READY:
+            return entry.instance
+        return await asyncio.get_running_loop().run_in_executor(None, self._load, entry)
+
+    def is_ready(self, name: str) -> bool:
+        return self._entries[name].state == READY
+
+    def load_all(self, max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Load every registered model in parallel; failures are recorded, not raised."""
+        entries = list(self._entries.values())
+        with ThreadPoolExecutor(
+            max_workers=max_workers or len(entries) or 1,
+            thread_name_prefix="model-load",
+        ) as pool:
+            futures = [pool.submit(self._load, e) for e in entries]
+            for f in futures:
+                f.exception()  # wait; the error is kept on the entry
+        return self.status()
+
+    def model_status(self, name: str) -> Dict[str, Any]:
+        entry = self._entries[name]
+        return {
+            "state": entry.state,
+            "ready": entry.state == READY,
+            "load_seconds": entry.load_seconds,
+            "warmup_seconds": entry.warmup_seconds,
+            "error": entry.error,
+            "version": entry.version,
+            "fingerprint": entry.fingerprint,
+            "loaded_at": entry.loaded_at,
+            "reload_error": entry.reload_error,
+            "failed_fingerprint": entry.failed_fingerprint,
+        }
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: self.model_status(name) for name in self._entries}
+
+    def all_ready(self) -> bool:
+        return all(e.state == READY for e in self._entries.values())
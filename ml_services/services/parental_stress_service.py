@@ -5,12 +5,29 @@ import numpy as np
 import pandas as pd
 import tensorflow as tf
 
+from services.dense_forward import NumpyDenseForward
+from services.feature_encoder import build_encoder, probe_rows_for, CompiledColumnEncoder
+from services.metrics import metrics
+from services.prediction_cache import LRUCache
+
 
 class ParentalStressService:
     IDX_TO_LEVEL = {0: "Low", 1: "Medium", 2: "High", 3: "Critical"}
     IDX_TO_LEVEL_LOWER = {0: "low", 1: "medium", 2: "high", 3: "critical"}
 
-    def __init__(self, base_dir: Path | None = None):
+    # "keras": model.predict (reference), "tf_function": compiled direct call,
+    # "numpy": exported dense weights evaluated with NumPy
+    ENGINES = ("keras", "tf_function", "numpy")
+    PARITY_ATOL = 1e-5
+
+    def __init__(
+        self,
+        base_dir: Path | None = None,
+        engine: str = "keras",
+        compile_features: bool = True,
+        cache_max_entries: int = 0,
+        cache_ttl_s: float | None = 3600.0,
+    ):
         # base_dir should point to ml_services/parental_stress_monitoring
         if base_dir is None:
             base_dir = (
@@ -29,6 +46,81 @@ class ParentalStressService:
         meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
         self.feature_cols = meta["feature_cols"]
 
+        # Memoized results keyed by the normalized row + artifact identity,
+        # so retrained artifacts never serve stale predictions
+        self.model_identity = ";".join(
+            f"{p.name}:{p.stat().st_size}:{p.stat().st_mtime_ns}"
+            for p in (self.model_path, self.preprocessor_path, self.meta_path)
+        )
+        self.cache = LRUCache(max_entries=cache_max_entries, ttl_s=cache_ttl_s)
+
+        # Request dict -> encoded row without pandas (sklearn path as fallback)
+        self.encoder = None
+        self.encoder_error = None
+        if compile_features:
+            self._init_encoder()
+
+        if engine not in self.ENGINES:
+            raise ValueError(f"engine must be one of {self.ENGINES}, got {engine!r}")
+        self.requested_engine = engine
+        self.engine = "keras"
+        self.engine_error = None
+        self._forward = self._keras_forward
+        if engine != "keras":
+            self._init_engine(engine)
+
+    def _sklearn_transform(self, rows) -> np.ndarray:
+        X = pd.DataFrame(list(rows), columns=self.feature_cols)
+        Xt = self.preprocessor.transform(X)
+        if hasattr(Xt, "toarray"):
+            Xt = Xt.toarray()
+        return Xt
+
+    def _init_encoder(self):
+        try:
+            probe = probe_rows_for(CompiledColumnEncoder(self.preprocessor))
+            self.encoder = build_encoder(self.preprocessor, probe, self._sklearn_transform)
+        except Exception as e:
+            self.encoder_error = f"compiled features disabled, using sklearn: {e}"
+
+    def _keras_forward(self, Xt: np.ndarray) -> np.ndarray:
+        return self.model.predict(Xt, verbose=0)
+
+    def _init_engine(self, engine: str):
+        """
+        Build the fast engine and check it against model.predict on a fixed
+        probe batch. On any failure or mismatch we keep the Keras engine.
+        """
+        try:
+            if engine == "numpy":
+                forward = NumpyDenseForward.from_keras(self.model)
+            else:
+                n_in = int(self.model.inputs[0].shape[-1])
+                compiled = tf.function(
+                    lambda x: self.model(x, training=False),
+                    input_signature=[tf.TensorSpec([None, n_in], tf.float32)],
+                    reduce_retracing=True,
+                )
+                forward = lambda X: compiled(tf.constant(X, dtype=tf.float32)).numpy()
+
+            n_in = int(self.model.inputs[0].shape[-1])
+            probe = np.random.default_rng(0).normal(size=(64, n_in)).astype(np.float32)
+            expected = self._keras_forward(probe)
+            got = forward(probe)
+            if got.shape != expected.shape:
+                raise ValueError(f"output shape {got.shape} != {expected.shape}")
+            if not np.array_equal(got.argmax(axis=1), expected.argmax(axis=1)):
+                raise ValueError("argmax differs from model.predict")
+            max_diff = float(np.max(np.abs(got - expected)))
+            if max_diff > self.PARITY_ATOL:
+                raise ValueError(f"max |diff| {max_diff:.2e} exceeds {self.PARITY_ATOL:.0e}")
+        except Exception as e:
+            self.engine_error = f"{engine} engine disabled, using keras: {e}"
+            return
+
+        self.engine = engine
+        self._forward = forward
+
     def health(self) -> dict:
         return {
             "status": "ok",
@@ -36,11 +128,19 @@ class ParentalStressService:
             "preprocessor_found": self.preprocessor_path.exists(),
             "meta_found": self.meta_path.exists(),
             "feature_cols_count": len(self.feature_cols),
+            "engine": self.engine,
+            "engine_error": self.engine_error,
+            "compiled_features": self.encoder is not None,
+            "compiled_features_error": self.encoder_error,
+            "cache": self.cache.stats(),
         }
 
-    def predict(self, features: dict) -> dict:
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    def _build_row(self, features: dict) -> dict:
         # Build row exactly as training expected (meta feature order)
-        row = {
+        return {
             "total_screen_time_min": features["total_screen_time_min"],
             "night_usage_min": features["night_usage_min"],
             "unlock_count": features["unlock_count"],
@@ -53,25 +153,102 @@ class ParentalStressService:
             "journal_sentiment": features["journal_sentiment"],
         }
 
-        X = pd.DataFrame([row], columns=self.feature_cols)
+    def _cache_key(self, row: dict):
+        # The row is already normalized (mood / sleep_quality lowercased and
+        # defaulted, flag as 0/1); None when a value isn't hashable
+        key = (self.model_identity, *row.values())
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
-        Xt = self.preprocessor.transform(X)
-        if hasattr(Xt, "toarray"):
-            Xt = Xt.toarray()
+    def predict(self, features: dict) -> dict:
+        return self.predict_batch([features])[0]
+
+    def predict_batch(self, features_list: list) -> list:
+        rows = [self._build_row(f) for f in features_list]
+        if not self.cache.enabled:
+            return self._predict_rows(rows)
+
+        # Rows seen before skip encoding and inference
+        results = [None] * len(rows)
+        keys = [self._cache_key(row) for row in rows]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
 
-        probs = self.model.predict(Xt, verbose=0)[0]  # shape (4,)
-        probs = np.array(probs, dtype=float)
+        if pending:
+            for i, result in zip(pending, self._predict_rows([rows[i] for i in pending])):
+                results[i] = result
+                if keys[i] is not None:
+                    self.cache.put(keys[i], result)
+        return results
 
-        if probs.ndim != 1 or probs.shape[0] != 4:
+    def _predict_rows(self, rows: list) -> list:
+        with metrics.stage("stress", "encode"):
+            if self.encoder is not None:
+                Xt = self.encoder.encode_many(rows)
+            else:
+                Xt = self._sklearn_transform(rows)
+
+        with metrics.stage("stress", "inference"):
+            probs = np.asarray(self._forward(Xt), dtype=float)  # shape (N, 4)
+
+        if probs.ndim != 2 or probs.shape != (len(rows), 4):
             raise ValueError(f"Unexpected model output shape: {probs.shape}")
 
-        stress_score = int(np.argmax(probs))
-        stress_probability = float(probs[stress_score])
+        with metrics.stage("stress", "postprocess"):
+            return self._format_many(probs)
 
-        return {
-            "stress_score": stress_score,
-            "stress_level_lower": self.IDX_TO_LEVEL_LOWER[stress_score],
-            "stress_level": self.IDX_TO_LEVEL[stress_score],
-            "stress_probability": stress_probability,
-            "raw": probs.tolist(),
-        }
+    def sample_inputs(self, n: int = 1, seed: int = 0) -> list:
+        """Synthetic requests from meta.json columns and the fitted one-hot categories."""
+        rng = np.random.default_rng(seed)
+        categories = {}
+        for _, transformer, columns in self.preprocessor.transformers_:
+            if hasattr(transformer, "categories_"):
+                for col, cats in zip(columns, transformer.categories_):
+                    categories[col] = [str(c) for c in cats]
+
+        rows = []
+        for i in range(n):
+            row = {}
+            for col in self.feature_cols:
+                if col in categories:
+                    row[col] = categories[col][i % len(categories[col])]
+                elif col == "late_night_usage_flag":
+                    row[col] = bool(i % 2)
+                elif col == "journal_sentiment":
+                    row[col] = float(rng.uniform(-1.0, 1.0))
+                else:
+                    row[col] = float(rng.uniform(0.0, 300.0))
+            rows.append(row)
+        return rows
+
+    def warmup(self, rounds: int = 2):
+        # Single-row and small-batch shapes, as served by the micro-batcher
+        # (bypasses the result cache)
+        for _ in range(rounds):
+            for n in (1, 8):
+                self._predict_rows([self._build_row(f) for f in self.sample_inputs(n)])
+
+    def _format_many(self, probs: np.ndarray) -> list:
+        # Two tolist() calls for the whole batch instead of NumPy scalar
+        # conversions per row; the results hold plain floats, which every
+        # encoder (and the cache) handles fastest
+        scores = probs.argmax(axis=1).tolist()
+        rows = probs.tolist()
+        return [
+            {
+                "stress_score": score,
+                "stress_level_lower": self.IDX_TO_LEVEL_LOWER[score],
+                "stress_level": self.IDX_TO_LEVEL[score],
+                "stress_probability": raw[score],
+                "raw": raw,
+            }
+            for score, raw in zip(scores, rows)
+        ]
@@ -0,0 +1,294 @@
+# services/prediction_capture.py
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from services.serialization import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed when capture is enabled
+    pa = None
+
+log = logging.getLogger(__name__)
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Fixed per-row cost on top of the two JSON payloads (list slots, bytes headers)
+_ROW_OVERHEAD = 100
+
+
+def _schema():
+    return pa.schema([
+        ("ts", pa.timestamp("ms", tz="UTC")),
+        ("model", pa.string()),
+        ("model_version", pa.string()),
+        ("latency_ms", pa.float32()),
+        ("batch_size", pa.int32()),
+        ("inputs", pa.string()),   # JSON
+        ("outputs", pa.string()),  # JSON
+    ])
+
+
+class PredictionCapture:
+    """
+    Records sampled predictions (inputs, outputs, model version, latency)
+    for drift analysis without doing I/O on the request path.
+
+    `wrap(name, batch_fn)` returns a batch function that, after the model
+    call, serializes the sampled rows and appends them to an in-memory ring
+    buffer. The buffer is capped at `max_buffer_bytes`: when full, the
+    oldest records are dropped. A background thread flushes the buffer
+    every `flush_interval_s` (or once it is half full) as one row group /
+    record batch of the current file, and starts a new file after
+    `rotate_rows` rows or `rotate_s` seconds.
+
+    Files are written as <name>.inprogress and renamed when closed, so
+    readers only ever see complete files. Any capture or flush error is
+    counted and swallowed: the prediction itself is never affected.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        enabled: bool = True,
+        file_format: str = "parquet",
+        sample_rate: float = 1.0,
+        sample_rates: Optional[Dict[str, float]] = None,
+        max_buffer_bytes: int = 32 * 1024 * 1024,
+        flush_interval_s: float = 5.0,
+        rotate_rows: int = 100_000,
+        rotate_s: float = 3600.0,
+    ):
+        if file_format not in FORMATS:
+            raise ValueError(f"CAPTURE_FORMAT must be one of {sorted(FORMATS)}, got {file_format!r}")
+        if enabled and pa is None:
+            raise RuntimeError("❌ CAPTURE_ENABLED=1 needs pyarrow: pip install pyarrow")
+
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.file_format = file_format
+        self.sample_rate = sample_rate
+        self.sample_rates = sample_rates or {}
+        self.max_buffer_bytes = max(0, int(max_buffer_bytes))
+        self.flush_interval_s = flush_interval_s
+        self.rotate_rows = max(1, int(rotate_rows))
+        self.rotate_s = rotate_s
+
+        self._buffer: deque = deque()
+        self._buffer_bytes = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Current output file; only touched by the flush thread (or stop())
+        self._writer = None
+        self._path: Optional[Path] = None
+        self._file_rows = 0
+        self._file_opened = 0.0
+        self._seq = 0
+
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.files = 0
+        self.last_error: Optional[str] = None
+
+    # ---- request path -------------------------------------------------
+
+    def wrap(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        inputs: Optional[Callable[[List[Any]], List[Any]]] = None,
+        version: Optional[Callable[[], Optional[str]]] = None,
+    ) -> Callable[[List[Any]], List[Any]]:
+        """batch_fn with capture; `inputs(items)` maps batch items to the logged inputs."""
+        if not self.enabled:
+            return batch_fn
+
+        def run(items):
+            t0 = time.perf_counter()
+            results = batch_fn(items)
+            self.record_batch(name, items, results, time.perf_counter() - t0, inputs, version)
+            return results
+
+        return run
+
+    def record_batch(self, model, items, results, latency_s, inputs=None, version=None):
+        try:
+            rate = self.sample_rates.get(model, self.sample_rate)
+            if rate <= 0:
+                return
+            rows = range(len(items)) if rate >= 1 else [i for i in range(len(items)) if random.random() < rate]
+            if not rows:
+                return
+            logged = inputs(items) if inputs is not None else items
+            # One buffer entry per model call: far fewer objects for the GC to track
+            xs = [dumps(logged[i]) for i in rows]
+            ys = [dumps(results[i]) for i in rows]
+            size = sum(map(len, xs)) + sum(map(len, ys)) + _ROW_OVERHEAD * len(xs)
+            entry = (time.time(), model, version() if version is not None else None,
+                     latency_s * 1000.0, len(items), xs, ys, size)
+            self._append(entry)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"capture {model}: {e}"
+
+    def _append(self, entry):
+        with self._lock:
+            self._buffer.append(entry)
+            self._buffer_bytes += entry[-1]
+            self.captured += len(entry[5])
+            # Ring buffer: evict the oldest calls past the memory cap
+            while self._buffer and self._buffer_bytes > self.max_buffer_bytes:
+                old = self._buffer.popleft()
+                self._buffer_bytes -= old[-1]
+                self.dropped += len(old[5])
+            full = self._buffer_bytes * 2 >= self.max_buffer_bytes
+        if full:
+            self._wake.set()
+
+    # ---- flush thread -------------------------------------------------
+
+    def start(self):
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="prediction-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush what is buffered and close the current file."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+        self._close_file()
+
+    def flush(self) -> int:
+        with self._lock:
+            if not self._buffer:
+                batch = None
+            else:
+                batch, self._buffer = self._buffer, deque()
+                self._buffer_bytes = 0
+        rows = sum(len(entry[5]) for entry in batch) if batch is not None else 0
+        try:
+            if batch is not None:
+                self._write(batch)
+            if self._writer is not None and time.time() - self._file_opened >= self.rotate_s:
+                self._close_file()
+        except Exception as e:
+            # Disk full, permissions...: the batch is lost, capture carries on
+            self.errors += 1
+            self.dropped += rows
+            self.last_error = f"flush: {e}"
+            self._close_file()
+            return 0
+        return rows
+
+    def _write(self, entries):
+        # Expand the per-call entries into one row per captured prediction
+        counts = [len(e[5]) for e in entries]
+        schema = _schema()
+        table = pa.Table.from_arrays(
+            [
+                pa.array(np.repeat([int(e[0] * 1000) for e in entries], counts), type=pa.int64())
+                .cast(schema.field("ts").type),
+                pa.array([e[1] for e, n in zip(entries, counts) for _ in range(n)], type=pa.string()),
+                pa.array([e[2] for e, n in zip(entries, counts) for _ in range(n)], type=pa.string()),
+                pa.array(np.repeat([e[3] for e in entries], counts), type=pa.float32()),
+                pa.array(np.repeat([e[4] for e in entries], counts), type=pa.int32()),
+                pa.array([x for e in entries for x in e[5]], type=pa.string()),
+                pa.array([y for e in entries for y in e[6]], type=pa.string()),
+            ],
+            schema=schema,
+        )
+        if self._writer is None:
+            self._open_file(schema)
+        self._writer.write_table(table)
+        self._file_rows += table.num_rows
+        self.written += table.num_rows
+        if self._file_rows >= self.rotate_rows:
+            self._close_file()
+
+    def _open_file(self, schema):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        # The pid keeps serve_prefork.py workers from writing to the same file
+        name = f"predictions-{stamp}-{os.getpid()}-{self._seq:04d}{FORMATS[self.file_format]}"
+        self._path = self.directory / name
+        tmp = self._path.with_name(name + ".inprogress")
+        if self.file_format == "parquet":
+            self._writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(str(tmp), schema)
+        self._file_rows = 0
+        self._file_opened = time.time()
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        writer, path = self._writer, self._path
+        self._writer = None
+        try:
+            writer.close()
+            os.replace(path.with_name(path.name + ".inprogress"), path)
+            self.files += 1
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"close {path.name}: {e}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory),
+            "format": self.file_format,
+            "sample_rate": self.sample_rate,
+            "sample_rates": self.sample_rates,
+            "buffered": sum(len(e[5]) for e in list(self._buffer)),
+            "buffered_bytes": self._buffer_bytes,
+            "max_buffer_bytes": self.max_buffer_bytes,
+            "captured": self.captured,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "files": self.files,
+            "current_file": self._path.name if self._writer is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """"stress=1,drawing=0.1" -> {"stress": 1.0, "drawing": 0.1}"""
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, rate = part.partition("=")
+        try:
+            rates[name.strip()] = float(rate)
+        except ValueError:
+            log.warning("Ignoring CAPTURE_SAMPLE_RATES entry %r", part)
+    return rates
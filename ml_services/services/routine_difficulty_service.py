@@ -2,8 +2,28 @@ from pathlib import Path
 import joblib
 import numpy as np
 
+from services.feature_encoder import LabelLookup
+from services.metrics import metrics
+from services.tree_engine import CompiledTreeEnsemble
+
+# Model input order; current_difficulty_level is appended encoded
+NUMERIC_FEATURES = (
+    "avg_completion_rate",
+    "avg_skepped_steps",
+    "avg_duration_minutes",
+    "runs_count",
+    "completion_rate_trend",
+)
+
 class RoutineDifficultyService:
-    def __init__(self, base_dir: Path | None = None):
+    # "lightgbm": model.predict (reference), "numpy": trees compiled to
+    # NumPy node tables (services/tree_engine.py)
+    ENGINES = ("lightgbm", "numpy")
+    PARITY_ATOL = 1e-9
+    # LightGBM's native batch loop wins on large batches
+    NUMPY_MAX_ROWS = 32
+
+    def __init__(self, base_dir: Path | None = None, engine: str = "lightgbm"):
         # base_dir should point to ml_services/interactive_visual_task_scheduler
         if base_dir is None:
             base_dir = Path(__file__).resolve().parent.parent / "interactive_visual_task_scheduler"
@@ -12,21 +32,100 @@ class RoutineDifficultyService:
         self.current_enc = joblib.load(base_dir / "current_level_encoder.joblib")
         self.next_enc = joblib.load(base_dir / "next_level_encoder.joblib")
 
+        # Dict lookups instead of LabelEncoder.transform on one-element lists
+        self.current_lookup = LabelLookup(self.current_enc)
+        self.next_lookup = LabelLookup(self.next_enc)
+
+        if engine not in self.ENGINES:
+            raise ValueError(f"engine must be one of {self.ENGINES}, got {engine!r}")
+        self.requested_engine = engine
+        self.engine = "lightgbm"
+        self.engine_error = None
+        self.compiled = None
+        if engine == "numpy":
+            self._init_engine()
+
+    def _init_engine(self):
+        """
+        Compile the trees and check them against model.predict_proba on
+        probe rows that hit every split threshold exactly and on both sides.
+        On any failure or mismatch we keep the LightGBM engine.
+        """
+        try:
+            compiled = CompiledTreeEnsemble.from_lightgbm(self.model)
+
+            rng = np.random.default_rng(0)
+            splits = compiled.threshold[np.isfinite(compiled.threshold)]
+            probe = rng.choice(splits, size=(256, compiled.n_features))
+            probe[128:] += rng.normal(scale=0.01, size=(128, compiled.n_features))
+            probe[:, 5] = rng.integers(0, len(self.current_lookup.classes_), size=len(probe))
+
+            expected = self.model.predict_proba(probe)
+            got = compiled.predict_proba(probe)
+            if got.shape != expected.shape:
+                raise ValueError(f"output shape {got.shape} != {expected.shape}")
+            if not np.array_equal(compiled.predict(probe), self.model.predict(probe)):
+                raise ValueError("predicted classes differ from model.predict")
+            max_diff = float(np.max(np.abs(got - expected)))
+            if max_diff > self.PARITY_ATOL:
+                raise ValueError(f"max |diff| {max_diff:.2e} exceeds {self.PARITY_ATOL:.0e}")
+        except Exception as e:
+            self.engine_error = f"numpy engine disabled, using lightgbm: {e}"
+            return
+
+        self.engine = "numpy"
+        self.compiled = compiled
+
+    def health(self) -> dict:
+        return {
+            "engine": self.engine,
+            "engine_error": self.engine_error,
+            "compiled_trees": self.compiled.n_trees if self.compiled is not None else None,
+        }
+
+    def _predict_encoded(self, X: np.ndarray) -> np.ndarray:
+        if self.compiled is not None and len(X) <= self.NUMPY_MAX_ROWS:
+            return self.compiled.predict(X)
+        return self.model.predict(X)
+
     def predict_next_level(self, features: dict) -> dict:
-        cur_level = features["current_difficulty_level"]
-        cur_encoded = self.current_enc.transform([cur_level])[0]
-
-        X = np.array([[
-            float(features["avg_completion_rate"]),
-            float(features["avg_skepped_steps"]),
-            float(features["avg_duration_minutes"]),
-            float(features["runs_count"]),
-            float(features["completion_rate_trend"]),
-            float(cur_encoded),
-        ]], dtype=float)
-
-        pred_encoded = self.model.predict(X)
-        pred_encoded = int(round(float(pred_encoded[0])))
-
-        next_level = self.next_enc.inverse_transform([pred_encoded])[0]
-        return {"next_difficulty_level": str(next_level)}
+        return self.predict_next_level_batch([features])[0]
+
+    def predict_next_level_batch(self, features_list: list) -> list:
+        # Column by column: each feature, and the level labels, in one pass
+        with metrics.stage("routine", "encode"):
+            X = np.empty((len(features_list), len(NUMERIC_FEATURES) + 1), dtype=float)
+            for j, col in enumerate(NUMERIC_FEATURES):
+                X[:, j] = [float(features[col]) for features in features_list]
+            X[:, -1] = self.current_lookup.encode_many(
+                [features["current_difficulty_level"] for features in features_list]
+            )
+
+        with metrics.stage("routine", "inference"):
+            pred_encoded = self._predict_encoded(X)
+
+        with metrics.stage("routine", "decode"):
+            labels = self.next_lookup.decode_many(np.rint(np.asarray(pred_encoded, dtype=float)))
+            return [{"next_difficulty_level": str(label)} for label in labels]
+
+    def sample_inputs(self, n: int = 1, seed: int = 0) -> list:
+        """Synthetic requests covering every current_difficulty_level class."""
+        rng = np.random.default_rng(seed)
+        levels = [str(c) for c in self.current_lookup.classes_]
+        return [
+            {
+                "childId": f"synthetic-{i}",
+                "avg_completion_rate": float(rng.uniform(0.0, 1.0)),
+                "avg_skepped_steps": float(rng.uniform(0.0, 5.0)),
+                "avg_duration_minutes": float(rng.uniform(1.0, 30.0)),
+                "runs_count": int(rng.integers(1, 20)),
+                "completion_rate_trend": float(rng.uniform(-0.5, 0.5)),
+                "current_difficulty_level": levels[i % len(levels)],
+            }
+            for i in range(n)
+        ]
+
+    def warmup(self, rounds: int = 2):
+        for _ in range(rounds):
+            self.predict_next_level_batch(self.sample_inputs(1))
+            self.predict_next_level_batch(self.sample_inputs(8))
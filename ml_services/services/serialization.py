@@ -0,0 +1,145 @@
+# services/serialization.py
+import json
+from typing import Any, Optional, Sequence
+from urllib.parse import quote
+
+import numpy as np
+from fastapi import HTTPException
+from starlette.responses import JSONResponse, Response
+
+from services.metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for application/msgpack responses
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+FLOAT32_TYPE = "application/x-float32"
+
+
+def _default(obj: Any):
+    # NumPy values the encoders don't handle natively (all of them for the
+    # stdlib / msgpack, non-contiguous or object arrays for orjson)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class _Staged:
+    """
+    Times the body encoding as ml_stage_seconds{model=<model>,stage="serialize"}.
+    Starlette renders in __init__, so `model` has to be set before that.
+    """
+
+    def __init__(self, content: Any = None, *args, model: str = "response", **kwargs):
+        self.model = model
+        super().__init__(content, *args, **kwargs)
+
+
+class ORJSONResponse(_Staged, JSONResponse):
+    """
+    JSON encoded with orjson; NumPy arrays and scalars are serialized
+    natively. Returned directly from a route, it also skips FastAPI's
+    jsonable_encoder pass over the already-built result.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with metrics.stage(self.model, "serialize"):
+            return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+class StdJSONResponse(_Staged, JSONResponse):
+    """Stdlib JSON with the same NumPy handling, for when orjson isn't installed."""
+
+    def render(self, content: Any) -> bytes:
+        with metrics.stage(self.model, "serialize"):
+            return json.dumps(
+                content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+
+
+class MsgpackResponse(_Staged, Response):
+    media_type = MSGPACK_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        with metrics.stage(self.model, "serialize"):
+            return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+class Float32Response(Response):
+    """
+    A numeric result as raw little-endian float32, row-major. The shape
+    and column names travel in the X-Shape / X-Columns headers. Each column
+    name is percent-encoded (UTF-8) before joining with ",", so names may
+    contain commas or non-latin-1 text: split on "," then unquote.
+    """
+
+    media_type = FLOAT32_TYPE
+
+    def __init__(
+        self, array: np.ndarray, columns: Optional[Sequence[str]] = None, model: str = "response", **kwargs
+    ):
+        self.model = model
+        with metrics.stage(model, "serialize"):
+            array = np.ascontiguousarray(array, dtype="<f4")
+            body = array.tobytes()
+        headers = {"X-Shape": ",".join(str(d) for d in array.shape), **kwargs.pop("headers", {})}
+        if columns is not None:
+            headers["X-Columns"] = ",".join(quote(str(c), safe="") for c in columns)
+        super().__init__(body, headers=headers, **kwargs)
+
+
+def json_response_class(name: str):
+    """"orjson" or "stdlib"; "auto" picks orjson when it is installed."""
+    if name == "auto":
+        name = "orjson" if orjson is not None else "stdlib"
+    if name == "orjson":
+        if orjson is None:
+            raise RuntimeError("❌ JSON_RESPONSE=orjson needs orjson: pip install orjson")
+        return ORJSONResponse
+    if name == "stdlib":
+        return StdJSONResponse
+    raise ValueError(f"JSON_RESPONSE must be auto, orjson or stdlib, got {name!r}")
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    return any(t in (content_type or "").lower() for t in MSGPACK_TYPES)
+
+
+def unpack(data: bytes) -> Any:
+    if msgpack is None:
+        raise HTTPException(status_code=415, detail="msgpack is not installed on the server")
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid msgpack body: {e}")
+
+
+def negotiate(accept: Optional[str], float32: bool = False) -> str:
+    """Response format for an Accept header: "json", "msgpack" or "float32"."""
+    accept = (accept or "").lower()
+    if float32 and FLOAT32_TYPE in accept:
+        return "float32"
+    if is_msgpack(accept):
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="msgpack is not installed on the server")
+        return "msgpack"
+    return "json"
@@ -1,18 +1,56 @@
 # services/tflite_drawing_service.py
+import asyncio
+import hashlib
 import io
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 import numpy as np
-import tensorflow as tf
 from PIL import Image
 
+from services.interpreter_pool import InterpreterPool
+from services.metrics import metrics
+from services.prediction_cache import LRUCache
+
+
+def preprocess_image(image_bytes: bytes, img_size=(224, 224)) -> np.ndarray:
+    """The model's training-time preprocessing: RGB, resized, scaled to [0, 1]."""
+    im = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    im = im.resize(img_size)
+    arr = np.array(im).astype(np.float32) / 255.0
+    arr = np.expand_dims(arr, axis=0)  # [1,H,W,3]
+    return arr
+
 
 class TFLiteDrawingService:
-    def __init__(self, model_path: Path, labels_path: Path, img_size=(224, 224)):
+    def __init__(
+        self,
+        model_path: Path,
+        labels_path: Path,
+        img_size=(224, 224),
+        max_batch_size: int = 32,
+        pool_size: int = 2,
+        num_threads: Optional[int] = None,
+        xnnpack: bool = True,
+        preprocess_mode: str = "exact",
+        cache_max_entries: int = 0,
+        cache_ttl_s: Optional[float] = 3600.0,
+        cache_max_bytes: Optional[int] = None,
+    ):
         self.model_path = Path(model_path)
         self.labels_path = Path(labels_path)
         self.img_size = img_size
+        self.max_batch_size = max(1, int(max_batch_size))
+
+        if preprocess_mode not in ("exact", "fast"):
+            raise ValueError(f"preprocess_mode must be 'exact' or 'fast', got {preprocess_mode!r}")
+        self.preprocess_mode = preprocess_mode
+        # Per-thread [1,H,W,3] input buffers for the fast path (executor threads
+        # run concurrently, so one shared buffer would race)
+        self._local = threading.local()
 
         # Validate files
         if not self.model_path.exists():
@@ -23,13 +61,26 @@ class TFLiteDrawingService:
         # Load labels
         self.labels = self._load_labels(self.labels_path)
 
-        # Load interpreter
-        self.interpreter = tf.lite.Interpreter(model_path=str(self.model_path))
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+        # Result cache keyed by upload content + model identity, so a swapped
+        # model file never serves stale predictions
+        st = self.model_path.stat()
+        self.model_identity = f"{self.model_path.name}:{st.st_size}:{st.st_mtime_ns}"
+        self.cache = LRUCache(
+            max_entries=cache_max_entries,
+            ttl_s=cache_ttl_s,
+            max_bytes=cache_max_bytes,
+        )
+
+        # Load interpreters (one per concurrent inference) and the worker
+        # threads that run them off the event loop
+        self.pool = InterpreterPool(self.model_path, size=pool_size, num_threads=num_threads, xnnpack=xnnpack)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.pool.size,
+            thread_name_prefix="tflite-drawing",
+        )
 
-    def _load_labels(self, path: Path):
+    @staticmethod
+    def _load_labels(path: Path):
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
 
@@ -74,20 +125,60 @@ class TFLiteDrawingService:
         raise ValueError(f"Unsupported labels JSON format: {path}")
 
     def preprocess_image(self, image_bytes: bytes):
-        im = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        im = im.resize(self.img_size)
-        arr = np.array(im).astype(np.float32) / 255.0
-        arr = np.expand_dims(arr, axis=0)  # [1,H,W,3]
-        return arr
+        return preprocess_image(image_bytes, self.img_size)
 
-    def predict_topk(self, image_bytes: bytes, k: int = 3):
-        x = self.preprocess_image(image_bytes)
+    def _input_buffer(self) -> np.ndarray:
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            w, h = self.img_size
+            buf = np.empty((1, h, w, 3), dtype=np.float32)
+            self._local.buf = buf
+        return buf
 
-        # Run inference
-        self.interpreter.set_tensor(self.input_details[0]["index"], x)
-        self.interpreter.invoke()
-        preds = self.interpreter.get_tensor(self.output_details[0]["index"])[0]  # [num_classes]
+    def _decode_fast_into(self, image_bytes: bytes, out: np.ndarray):
+        im = Image.open(io.BytesIO(image_bytes))
+
+        # JPEG: let libjpeg decode at a reduced scale (1/2, 1/4, 1/8) that is
+        # still >= the target size, instead of decoding all 12 MP
+        im.draft("RGB", self.img_size)
+
+        # Resizing before the colour conversion touches 3 channels at the
+        # target size only. Limited to L/RGB, where both orders give the same
+        # result (RGBA/P resize differently from their RGB conversion).
+        if im.mode in ("RGB", "L"):
+            im = im.resize(self.img_size)
+            if im.mode != "RGB":
+                im = im.convert("RGB")
+        else:
+            im = im.convert("RGB").resize(self.img_size)
 
+        # uint8 -> float32 /255 straight into the caller's buffer
+        np.divide(np.asarray(im), np.float32(255.0), out=out, casting="unsafe")
+
+    def preprocess_image_fast(self, image_bytes: bytes) -> np.ndarray:
+        """
+        Same contract as preprocess_image, with reduced-size JPEG decoding and
+        no intermediate copies. Outputs can differ slightly from the exact path
+        because JPEG draft decoding downsamples before the resize.
+        The returned array is a reused per-thread buffer: consume it before the
+        next call on the same thread.
+        """
+        buf = self._input_buffer()
+        self._decode_fast_into(image_bytes, buf[0])
+        return buf
+
+    def _preprocess(self, image_bytes: bytes) -> np.ndarray:
+        if self.preprocess_mode == "fast":
+            return self.preprocess_image_fast(image_bytes)
+        return self.preprocess_image(image_bytes)
+
+    def _preprocess_into(self, image_bytes: bytes, out: np.ndarray):
+        if self.preprocess_mode == "fast":
+            self._decode_fast_into(image_bytes, out)
+        else:
+            out[...] = self.preprocess_image(image_bytes)[0]
+
+    def _format_topk(self, preds, k: int):
         k = max(1, min(k, len(preds)))
         top_idx = np.argsort(preds)[-k:][::-1].tolist()
 
@@ -97,3 +188,128 @@ class TFLiteDrawingService:
         ]
 
         return {"top1": top[0], "topk": top}
+
+    def _invoke(self, x: np.ndarray) -> np.ndarray:
+        with self.pool.acquire() as interp:
+            return interp.invoke(x)  # [N,num_classes]
+
+    def _cache_key(self, image_bytes: bytes, k: int):
+        digest = hashlib.blake2b(image_bytes, digest_size=16).digest()
+        return (digest, self.model_identity, self.preprocess_mode, k)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    def predict_topk(self, image_bytes: bytes, k: int = 3):
+        key = self._cache_key(image_bytes, k) if self.cache.enabled else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with metrics.stage("drawing", "decode"):
+            x = self._preprocess(image_bytes)
+
+        # Run inference
+        with metrics.stage("drawing", "inference"):
+            preds = self._invoke(x)[0]  # [num_classes]
+        with metrics.stage("drawing", "postprocess"):
+            result = self._format_topk(preds, k)
+
+        if key is not None:
+            self.cache.put(key, result)
+        return result
+
+    def _invoke_chunks(self, images: List[bytes], indices: List[int], errors: List[Any]):
+        """
+        Decode and invoke images[indices] in chunks of `max_batch_size`,
+        yielding (decoded indices, [n, num_classes] scores). Images that fail
+        to decode are skipped and get an "error" entry in `errors`.
+        """
+        w, h = self.img_size
+        for start in range(0, len(indices), self.max_batch_size):
+            chunk = indices[start:start + self.max_batch_size]
+
+            # Decode straight into the batch tensor; failed images are skipped
+            x = np.empty((len(chunk), h, w, 3), dtype=np.float32)
+            ok: List[int] = []
+            with metrics.stage("drawing", "decode"):
+                for i in chunk:
+                    try:
+                        self._preprocess_into(images[i], x[len(ok)])
+                        ok.append(i)
+                    except Exception as e:
+                        errors[i] = {"error": f"Could not decode image: {e}"}
+
+            if ok:
+                with metrics.stage("drawing", "inference"):
+                    preds = self._invoke(x[:len(ok)])
+                yield ok, preds
+
+    def predict_proba_batch(self, images: List[bytes]) -> np.ndarray:
+        """
+        Class scores [N, num_classes] in label order, uncached. Rows of
+        images that fail to decode are NaN.
+        """
+        scores = np.full((len(images), len(self.labels)), np.nan, dtype=np.float32)
+        errors: List[Any] = [None] * len(images)
+        for ok, preds in self._invoke_chunks(images, list(range(len(images))), errors):
+            scores[ok] = preds
+        return scores
+
+    def predict_topk_batch(self, images: List[bytes], k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Classify several images with one interpreter invoke per chunk of
+        `max_batch_size`. Images that fail to decode get an "error" entry
+        instead of failing the whole batch; results keep the input order.
+        """
+        results: List[Dict[str, Any]] = [None] * len(images)
+
+        # Serve cached images first; only the rest are decoded and invoked
+        keys = [None] * len(images)
+        pending = list(range(len(images)))
+        if self.cache.enabled:
+            pending = []
+            for i, image_bytes in enumerate(images):
+                keys[i] = self._cache_key(image_bytes, k)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    results[i] = cached
+                else:
+                    pending.append(i)
+
+        for ok, preds in self._invoke_chunks(images, pending, results):
+            with metrics.stage("drawing", "postprocess"):
+                for i, row in zip(ok, preds):
+                    results[i] = self._format_topk(row, k)
+                    if keys[i] is not None:
+                        self.cache.put(keys[i], results[i])
+
+        return results
+
+    def sample_inputs(self, n: int = 1, seed: int = 0) -> List[bytes]:
+        """Synthetic PNG uploads at the model's input size."""
+        rng = np.random.default_rng(seed)
+        w, h = self.img_size
+        images = []
+        for _ in range(n):
+            arr = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+            buf = io.BytesIO()
+            Image.fromarray(arr).save(buf, "PNG")
+            images.append(buf.getvalue())
+        return images
+
+    def warmup(self, rounds: int = 2):
+        # Bypasses the result cache: decode path + every pooled interpreter
+        for _ in range(rounds):
+            for image_bytes in self.sample_inputs(1):
+                self._preprocess(image_bytes)
+            self.pool.warmup()
+
+    async def predict_topk_async(self, image_bytes: bytes, k: int = 3):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.predict_topk, image_bytes, k)
+
+    async def predict_topk_batch_async(self, images: List[bytes], k: int = 3):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.predict_topk_batch, images, k)
@@ -0,0 +1,186 @@
+# services/tree_engine.py
+from typing import Any, Dict, List
+
+import numpy as np
+
+# LightGBM missing_type codes
+_MISSING_NONE, _MISSING_ZERO, _MISSING_NAN = 0, 1, 2
+_MISSING_CODES = {"None": _MISSING_NONE, "Zero": _MISSING_ZERO, "NaN": _MISSING_NAN}
+_ZERO_THRESHOLD = float(np.float32(1e-35))  # LightGBM kZeroThreshold is the float 1e-35f
+
+
+class CompiledTreeEnsemble:
+    """
+    Inference-only copy of a fitted LightGBM classifier.
+
+    Every tree is flattened into one set of node tables (split feature,
+    threshold, children, missing-value rule, leaf value) indexed by a global
+    node id. Leaves are nodes that point to themselves with an infinite
+    threshold, so all trees are walked at once with plain 1-D `take`s over
+    an (n_trees, n_rows) array of node ids, with no Booster call and no
+    per-tree Python loop. Trees are ordered deepest first, so step d only
+    touches the leading trees that are still deeper than d.
+
+    Supports numerical splits with LightGBM's missing-value rules and the
+    binary / multiclass (softmax) objectives. Anything else raises
+    ValueError at build time, so the caller can keep LightGBM.
+    """
+
+    def __init__(
+        self,
+        trees: List[Dict[str, Any]],
+        num_class: int,
+        objective: str,
+        classes: np.ndarray,
+        n_features: int,
+        sigmoid: float = 1.0,
+    ):
+        if not trees:
+            raise ValueError("Model has no trees")
+        self.num_class = num_class
+        self.objective = objective
+        self.classes_ = np.asarray(classes)
+        self.n_features = n_features
+        self.sigmoid = sigmoid
+        self.n_trees = len(trees)
+
+        feature: List[int] = []
+        threshold: List[float] = []
+        left: List[int] = []
+        right: List[int] = []
+        missing: List[int] = []
+        default_left: List[bool] = []
+        value: List[float] = []
+        roots: List[int] = []
+        depths: List[int] = []
+
+        def visit(node, depth) -> int:
+            idx = len(feature)
+            feature.append(0)
+            threshold.append(np.inf)
+            left.append(idx)
+            right.append(idx)
+            missing.append(_MISSING_NONE)
+            default_left.append(True)
+            value.append(0.0)
+            if "split_index" not in node:
+                value[idx] = float(node["leaf_value"])
+                depths[-1] = max(depths[-1], depth)
+                return idx
+            if node.get("decision_type", "<=") != "<=":
+                raise ValueError(f"Unsupported split for NumPy engine: {node.get('decision_type')}")
+            feature[idx] = int(node["split_feature"])
+            threshold[idx] = float(node["threshold"])
+            missing[idx] = _MISSING_CODES[node.get("missing_type", "None")]
+            default_left[idx] = bool(node.get("default_left", True))
+            left[idx] = visit(node["left_child"], depth + 1)
+            right[idx] = visit(node["right_child"], depth + 1)
+            return idx
+
+        # Deepest trees first; tree_class maps each (reordered) tree to its class
+        k = num_class if objective == "multiclass" else 1
+        for t in trees:
+            depths.append(0)
+            roots.append(visit(t["tree_structure"], 0))
+        order = np.argsort(-np.asarray(depths), kind="stable")
+        depths_sorted = np.asarray(depths)[order]
+        self.max_depth = int(depths_sorted[0])
+        # active[d]: number of leading trees that still split at step d
+        self.active = [int((depths_sorted > d).sum()) for d in range(self.max_depth)]
+        # Trees are stored iteration-major: tree t scores class t % k
+        self.tree_class = np.zeros((len(trees), k), dtype=np.float64)
+        self.tree_class[np.arange(len(trees)), order % k] = 1.0
+
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        self.children = np.column_stack([self.left, self.right]).ravel()
+        self.missing = np.asarray(missing, dtype=np.int8)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.root = np.asarray(roots, dtype=np.intp)[order]
+        # Only models trained with missing values need the slower split rule
+        self._plain_splits = not (self.missing != _MISSING_NONE).any()
+
+    @classmethod
+    def from_lightgbm(cls, model) -> "CompiledTreeEnsemble":
+        """Build from a fitted LGBMClassifier (or its Booster plus `classes`)."""
+        booster = getattr(model, "booster_", model)
+        dump = booster.dump_model()
+
+        objective, *params = dump["objective"].split()
+        if objective not in ("binary", "multiclass"):
+            raise ValueError(f"Unsupported objective for NumPy engine: {objective}")
+        if dump.get("average_output"):
+            raise ValueError("Random forest mode is not supported by the NumPy engine")
+        if any(t.get("is_linear") for t in dump["tree_info"]):
+            raise ValueError("Linear trees are not supported by the NumPy engine")
+
+        num_class = int(dump["num_class"])
+        per_iter = int(dump["num_tree_per_iteration"])
+        trees = dump["tree_info"]
+        # Same iteration count as predict(): best_iteration when early stopping was used
+        best = int(getattr(booster, "best_iteration", 0) or 0)
+        if best > 0:
+            trees = trees[: best * per_iter]
+
+        sigmoid = 1.0
+        for p in params:
+            if p.startswith("sigmoid:"):
+                sigmoid = float(p.split(":", 1)[1])
+
+        classes = getattr(model, "classes_", np.arange(max(num_class, 2)))
+        return cls(trees, num_class, objective, classes, int(dump["max_feature_idx"]) + 1, sigmoid)
+
+    def raw_score(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, model expects {self.n_features}")
+        n = X.shape[0]
+        # LightGBM drops |x| <= kZeroThreshold from its input rows, so they read as 0
+        X = np.where(np.abs(X) <= _ZERO_THRESHOLD, 0.0, X)
+        if self._plain_splits:
+            X[np.isnan(X)] = 0.0  # missing_type None: NaN is read as 0
+        X = X.ravel()
+
+        row_offset = np.arange(n) * self.n_features
+        node = np.repeat(self.root[:, None], n, axis=1)  # (n_trees, n)
+        for m in self.active:
+            sub = node[:m]
+            x = X.take(row_offset + self.feature.take(sub))
+            go_right = x > self.threshold.take(sub)
+            if not self._plain_splits:
+                go_right = self._missing_rule(x, sub)
+            node[:m] = self.children.take(2 * sub + go_right)
+
+        leaves = self.value.take(node)  # (n_trees, n)
+        return leaves.T @ self.tree_class  # (n, k)
+
+    def _missing_rule(self, x: np.ndarray, node: np.ndarray) -> np.ndarray:
+        mt = self.missing.take(node)
+        nan = np.isnan(x)
+        x = np.where(nan & (mt != _MISSING_NAN), 0.0, x)
+        plain = ~(x <= self.threshold.take(node))
+        use_default = ((mt == _MISSING_ZERO) & (np.abs(x) <= _ZERO_THRESHOLD)) | ((mt == _MISSING_NAN) & nan)
+        # Leaves have missing_type None, so they keep looping on themselves
+        return np.where(use_default, ~self.default_left.take(node), plain)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        raw = self.raw_score(X)
+        if self.objective == "binary":
+            p = 1.0 / (1.0 + np.exp(-self.sigmoid * raw[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        raw -= raw.max(axis=1, keepdims=True)
+        np.exp(raw, out=raw)
+        raw /= raw.sum(axis=1, keepdims=True)
+        return raw
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        raw = self.raw_score(X)
+        if self.objective == "binary":
+            return self.classes_[(raw[:, 0] > 0).astype(np.intp)]
+        return self.classes_[raw.argmax(axis=1)]
@@ -0,0 +1,41 @@
+# tests/conftest.py
+# Run from ml_services/:  python -m pytest tests
+import sys
+from pathlib import Path
+
+import pytest
+
+ML_DIR = Path(__file__).resolve().parent.parent
+
+# The app imports its modules as `services.x` / `benchmarks.x` from ml_services/
+sys.path.insert(0, str(ML_DIR))
+
+STRESS_DIR = ML_DIR / "parental_stress_monitoring"
+COGNITIVE_MODEL = ML_DIR / "cognitive_progress_prediction" / "best_cognitive_progress_model.pkl"
+
+
+@pytest.fixture(scope="session")
+def stress_preprocessor():
+    """Fitted ColumnTransformer of the stress model."""
+    import joblib
+
+    return joblib.load(STRESS_DIR / "preprocessor.joblib")
+
+
+@pytest.fixture(scope="session")
+def cognitive_preprocessor():
+    """Fitted ColumnTransformer ("prep" step) of the cognitive pipeline."""
+    import joblib
+
+    return joblib.load(COGNITIVE_MODEL).named_steps["prep"]
+
+
+@pytest.fixture(scope="session")
+def stress_service():
+    """The served stress model on the NumPy engine (skipped without TensorFlow)."""
+    pytest.importorskip("tensorflow")
+    from services.parental_stress_service import ParentalStressService
+
+    svc = ParentalStressService(STRESS_DIR, engine="numpy")
+    assert svc.engine == "numpy", svc.engine_error
+    return svc
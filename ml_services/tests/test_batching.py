@@ -0,0 +1,87 @@
+# tests/test_batching.py
+"""MicroBatcher: coalescing, concurrent batches and per-item retry."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.batching import MicroBatcher
+
+
+class StubModel:
+    """batch_fn doubling its inputs; records batch sizes and peak concurrency."""
+
+    def __init__(self, delay_s: float = 0.0):
+        self.delay_s = delay_s
+        self.sizes = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, items):
+        with self._lock:
+            self.sizes.append(len(items))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay_s)
+            if "bad" in items:
+                raise ValueError("bad item")
+            return [x * 2 for x in items]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+async def _submit_all(batcher, items):
+    return await asyncio.gather(*(batcher.submit(x) for x in items), return_exceptions=True)
+
+
+def test_coalesces_up_to_max_batch_size():
+    model = StubModel()
+    batcher = MicroBatcher("stub", model, max_batch_size=4, max_wait_ms=50)
+
+    results = asyncio.run(_submit_all(batcher, list(range(10))))
+
+    assert results == [x * 2 for x in range(10)]
+    assert model.sizes == [4, 4, 2]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["items"], stats["max_seen_batch"]) == (3, 10, 4)
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_runs_at_most_max_concurrency_batches(max_concurrency):
+    model = StubModel(delay_s=0.05)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        batcher = MicroBatcher(
+            "stub", model, max_batch_size=2, max_wait_ms=1, executor=pool, max_concurrency=max_concurrency
+        )
+        results = asyncio.run(_submit_all(batcher, list(range(8))))
+
+    assert results == [x * 2 for x in range(8)]
+    assert model.peak == max_concurrency
+    assert sum(model.sizes) == 8
+
+
+def test_bad_item_fails_alone():
+    model = StubModel()
+    batcher = MicroBatcher("stub", model, max_batch_size=8, max_wait_ms=20)
+
+    results = asyncio.run(_submit_all(batcher, [1, "bad", 3]))
+
+    assert results[0] == 2 and results[2] == 6
+    assert isinstance(results[1], ValueError)
+    # One failed batch, then each item on its own
+    assert model.sizes == [3, 1, 1, 1]
+
+
+def test_batching_disabled_calls_one_item_at_a_time():
+    model = StubModel()
+    batcher = MicroBatcher("stub", model, max_batch_size=1)
+
+    results = asyncio.run(_submit_all(batcher, [1, 2, "bad"]))
+
+    assert results[:2] == [2, 4] and isinstance(results[2], ValueError)
+    assert model.sizes == [1, 1, 1]
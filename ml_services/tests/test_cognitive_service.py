@@ -0,0 +1,92 @@
+# tests/test_cognitive_service.py
+"""Deferred explanation tokens across reloads, and the prediction cache."""
+import time
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("shap")
+
+from services.cognitive_progress_service import CognitiveProgressService, DeferredExplanations
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / "cognitive_progress_prediction" / "best_cognitive_progress_model.pkl"
+
+
+@pytest.fixture(scope="module")
+def deferred():
+    return DeferredExplanations()
+
+
+@pytest.fixture(scope="module")
+def service(deferred):
+    return CognitiveProgressService(MODEL_PATH, deferred=deferred)
+
+
+def _wait(svc, token, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        result = svc.get_explanation(token)
+        if result is None or result["status"] != "pending" or time.monotonic() > deadline:
+            return result
+        time.sleep(0.01)
+
+
+def test_deferred_token_resolves_after_a_reload(service, deferred):
+    features = service.sample_inputs(1)[0]
+    token = service.predict(features, top_k=3, explain="deferred")["explanation_token"]
+
+    # A hot reload builds a new instance from the same artifacts
+    reloaded = CognitiveProgressService(MODEL_PATH, deferred=deferred)
+    result = _wait(reloaded, token)
+
+    assert result["status"] == "done"
+    assert result["explainability"] == service.predict(features, top_k=3, explain="sync")["explainability"]
+    assert reloaded.get_explanation("unknown") is None
+
+
+@pytest.fixture(scope="module")
+def cached(deferred):
+    return CognitiveProgressService(MODEL_PATH, deferred=deferred, cache_max_entries=64)
+
+
+def _lookups(svc):
+    stats = svc.cache_stats()
+    return stats["hits"], stats["misses"]
+
+
+def test_cache_hits_equal_numerics_and_misses_new_inputs(cached):
+    features = cached.sample_inputs(1, seed=1)[0]
+    column = cached.schema.numeric[0]
+    hits, misses = _lookups(cached)
+
+    first = cached.predict({**features, column: 1}, top_k=3)
+    assert _lookups(cached) == (hits, misses + 1)
+    for same in (1, 1.0, "1"):
+        assert cached.predict({**features, column: same}, top_k=3) == first
+    assert _lookups(cached) == (hits + 3, misses + 1)
+
+    # Another value, top_k or explain mode is another entry
+    cached.predict({**features, column: 2}, top_k=3)
+    cached.predict({**features, column: 1}, top_k=5)
+    cached.predict({**features, column: 1}, top_k=3, explain="none")
+    assert _lookups(cached) == (hits + 3, misses + 4)
+
+
+def test_deferred_rows_are_not_cached(cached):
+    features = cached.sample_inputs(1, seed=2)[0]
+    a = cached.predict(features, explain="deferred")
+    b = cached.predict(features, explain="deferred")
+    assert a["explanation_token"] != b["explanation_token"]
+
+
+def test_no_caching_without_known_input_columns(cached):
+    features = cached.sample_inputs(1, seed=3)[0]
+    assert cached._cache_key(features, "sync", 3) is not None
+    schema = cached.schema
+    try:
+        cached.schema = replace(schema, expected_columns=())
+        assert cached._cache_key(features, "sync", 3) is None
+        assert cached._cache_key({"other": 1}, "sync", 3) is None
+    finally:
+        cached.schema = schema
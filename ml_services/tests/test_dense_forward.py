@@ -0,0 +1,53 @@
+# tests/test_dense_forward.py
+"""The NumPy forward pass must match Keras on the stress model."""
+import numpy as np
+import pytest
+
+from services.dense_forward import NumpyDenseForward
+
+
+def _assert_same(got, expected, atol):
+    assert got.shape == expected.shape
+    assert np.array_equal(got.argmax(axis=1), expected.argmax(axis=1))
+    assert float(np.max(np.abs(got - expected))) <= atol
+
+
+def test_random_inputs_match_keras(stress_service):
+    forward = NumpyDenseForward.from_keras(stress_service.model)
+    # Wider than the load-time probe: other seed, larger batch and magnitudes
+    X = np.random.default_rng(1).normal(scale=3.0, size=(512, forward.n_features)).astype(np.float32)
+    _assert_same(forward(X), stress_service._keras_forward(X), stress_service.PARITY_ATOL)
+
+
+def test_encoded_requests_match_keras(stress_service):
+    rows = stress_service.sample_inputs(256, seed=3)
+    Xt = stress_service._sklearn_transform(rows).astype(np.float32)
+    _assert_same(stress_service._forward(Xt), stress_service._keras_forward(Xt), stress_service.PARITY_ATOL)
+
+
+def test_single_row_matches_batch(stress_service):
+    forward = NumpyDenseForward.from_keras(stress_service.model)
+    X = np.random.default_rng(2).normal(size=(8, forward.n_features)).astype(np.float32)
+    batch = forward(X)
+    for i in range(len(X)):
+        np.testing.assert_allclose(forward(X[i]), batch[i:i + 1], rtol=0, atol=1e-6)
+
+
+@pytest.fixture(scope="module")
+def keras_service(stress_service):
+    from services.parental_stress_service import ParentalStressService
+
+    return ParentalStressService(stress_service.base_dir, engine="keras")
+
+
+@pytest.mark.parametrize("engine", ["numpy", "tf_function"])
+def test_service_engines_predict_like_keras(stress_service, keras_service, engine):
+    from services.parental_stress_service import ParentalStressService
+
+    svc = stress_service if engine == "numpy" else ParentalStressService(stress_service.base_dir, engine=engine)
+    assert svc.engine == engine, svc.engine_error
+    rows = svc.sample_inputs(64, seed=4)
+    got = svc.predict_batch(rows)
+    expected = keras_service.predict_batch(rows)
+    assert [r["stress_level"] for r in got] == [r["stress_level"] for r in expected]
+    assert np.allclose([r["raw"] for r in got], [r["raw"] for r in expected], rtol=0, atol=svc.PARITY_ATOL)
@@ -0,0 +1,78 @@
+# tests/test_feature_encoder.py
+"""CompiledColumnEncoder must encode exactly like the fitted sklearn ColumnTransformer."""
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")  # the fitted preprocessors are sklearn objects
+
+from services.feature_encoder import CompiledColumnEncoder, build_encoder, probe_rows_for
+
+PREPROCESSORS = ["stress_preprocessor", "cognitive_preprocessor"]
+
+
+@pytest.fixture(params=PREPROCESSORS)
+def preprocessor(request):
+    return request.getfixturevalue(request.param)
+
+
+def _sklearn(ct, rows):
+    Xt = ct.transform(pd.DataFrame(list(rows), columns=list(ct.feature_names_in_)))
+    return np.asarray(Xt.toarray() if hasattr(Xt, "toarray") else Xt, dtype=np.float64)
+
+
+def _random_rows(encoder, n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        row = {c: float(rng.normal(scale=100.0)) for c in encoder.num_cols}
+        for c, index, _ in encoder.onehot:
+            cats = list(index)
+            row[c] = cats[rng.integers(len(cats))]
+        rows.append(row)
+    return rows
+
+
+def _assert_same(got, expected):
+    assert got.shape == expected.shape
+    max_diff = float(np.max(np.abs(got - expected)))
+    assert max_diff <= 1e-9, f"max |diff| {max_diff:.2e}"
+
+
+def test_compiles_and_passes_the_load_time_check(preprocessor):
+    encoder = CompiledColumnEncoder(preprocessor)
+    build_encoder(preprocessor, probe_rows_for(encoder), lambda rows: _sklearn(preprocessor, rows))
+    assert encoder.n_features_out == _sklearn(preprocessor, probe_rows_for(encoder)).shape[1]
+
+
+def test_random_rows_match_sklearn(preprocessor):
+    encoder = CompiledColumnEncoder(preprocessor)
+    rows = _random_rows(encoder, 500)
+    _assert_same(encoder.encode_many(rows), _sklearn(preprocessor, rows))
+
+
+def test_int_inputs_and_single_rows_match_sklearn(preprocessor):
+    encoder = CompiledColumnEncoder(preprocessor)
+    rows = _random_rows(encoder, 20, seed=1)
+    for row in rows:
+        for c in encoder.num_cols:
+            row[c] = int(row[c])
+    expected = _sklearn(preprocessor, rows)
+    for i, row in enumerate(rows):
+        _assert_same(encoder.encode(row), expected[i:i + 1])
+
+
+def test_unknown_categories_follow_handle_unknown(preprocessor):
+    encoder = CompiledColumnEncoder(preprocessor)
+    rows = _random_rows(encoder, 10, seed=2)
+    for row in rows[::2]:
+        for c, _, _ in encoder.onehot:
+            row[c] = "never-seen-category"
+
+    if any(raise_unknown for _, _, raise_unknown in encoder.onehot):
+        with pytest.raises(ValueError):
+            encoder.encode_many(rows)
+        with pytest.raises(ValueError):
+            _sklearn(preprocessor, rows)
+    else:
+        _assert_same(encoder.encode_many(rows), _sklearn(preprocessor, rows))
@@ -0,0 +1,132 @@
+# tests/test_job_queue.py
+"""SQLite job queue: backpressure, leases, retries and per-job failures."""
+import time
+
+import pytest
+
+from services.job_queue import DONE, ERROR, QUEUED, RUNNING, JobStore, JobWorkers, QueueFull
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = JobStore(tmp_path / "jobs.sqlite3", lease_s=300.0, max_attempts=2)
+    yield s
+    s.close()
+
+
+def _expire_leases(store):
+    # Every running lease ran out a second ago
+    store._conn().execute("UPDATE jobs SET lease_until = ? WHERE status = ?", (time.time() - 1, RUNNING))
+
+
+def _doubler(payloads):
+    if any(p.get("bad") for p in payloads):
+        raise ValueError("bad payload")
+    return [{"y": p["x"] * 2} for p in payloads]
+
+
+def test_submit_and_queue_full(store):
+    ids = store.submit("m", [{"x": 1}, {"x": 2}], max_pending=3)
+    assert len(ids) == 2
+    assert {job["status"] for job in store.get(ids).values()} == {QUEUED}
+
+    with pytest.raises(QueueFull) as e:
+        store.submit("m", [{"x": 3}, {"x": 4}], max_pending=3)
+    assert (e.value.pending, e.value.limit) == (2, 3)
+    assert store.pending() == 2  # the rejected batch inserted nothing
+
+    store.submit("m", [{"x": 3}], max_pending=3)
+    assert store.pending() == 3
+
+
+def test_claim_batches_the_oldest_model(store):
+    a = store.submit("a", [{"x": 1}])
+    b = store.submit("b", [{"x": 2}, {"x": 3}])
+    store.submit("a", [{"x": 4}])
+
+    model, jobs = store.claim(10)
+    assert model == "a" and [job[2] for job in jobs] == [{"x": 1}, {"x": 4}]
+    assert jobs[0][:2] == (a[0], 1)
+
+    model, jobs = store.claim(1, models=["b"])
+    assert model == "b" and [job[0] for job in jobs] == b[:1]
+    assert store.claim(10, models=["a"]) == (None, [])
+
+
+def test_expired_lease_requeues_the_job(store):
+    (job_id,) = store.submit("m", [{"x": 1}])
+    _, jobs = store.claim(10)
+    assert store.claim(10) == (None, [])  # leased
+
+    _expire_leases(store)
+    _, jobs = store.claim(10)
+    assert [(j, attempt) for j, attempt, _ in jobs] == [(job_id, 2)]
+    assert store.get([job_id])[job_id]["attempts"] == 2
+
+
+def test_abandoned_after_max_attempts(store):
+    (job_id,) = store.submit("m", [{"x": 1}])
+    for _ in range(2):
+        assert store.claim(10)[1]
+        _expire_leases(store)
+
+    assert store.claim(10) == (None, [])
+    job = store.get([job_id])[job_id]
+    assert job["status"] == ERROR
+    assert job["error"] == "Abandoned after 2 attempts"
+
+
+def test_finish_ignores_a_reclaimed_job(store):
+    (job_id,) = store.submit("m", [{"x": 1}])
+    _, [stale] = store.claim(10)
+    _expire_leases(store)
+    _, [current] = store.claim(10)
+
+    # The first worker finishes late: its claim no longer owns the job
+    store.finish([(stale[0], stale[1], {"y": "stale"}, None)])
+    assert store.get([job_id])[job_id]["status"] == RUNNING
+
+    store.finish([(current[0], current[1], {"y": 2}, None)])
+    job = store.get([job_id])[job_id]
+    assert (job["status"], job["result"]) == (DONE, {"y": 2})
+
+
+def test_one_bad_job_fails_alone(store):
+    workers = JobWorkers(store, {"m": _doubler}, workers=1)
+    ids = store.submit("m", [{"x": 1}, {"bad": True}, {"x": 3}])
+
+    assert workers.run_once()
+    jobs = store.get(ids)
+    assert [jobs[i]["status"] for i in ids] == [DONE, ERROR, DONE]
+    assert [jobs[i]["result"] for i in ids] == [{"y": 2}, None, {"y": 6}]
+    assert jobs[ids[1]]["error"] == "bad payload"
+    assert (workers.batches, workers.jobs, workers.failed) == (1, 3, 1)
+    assert workers.run_once() is False
+
+
+def test_result_count_mismatch_falls_back_per_job(store):
+    calls = []
+
+    def drops_one(payloads):
+        calls.append(len(payloads))
+        return [{"ok": True}] * max(1, len(payloads) - 1)
+
+    workers = JobWorkers(store, {"m": drops_one}, workers=1)
+    ids = store.submit("m", [{}, {}, {}])
+    workers.run_once()
+    assert calls == [3, 1, 1, 1]
+    assert {job["status"] for job in store.get(ids).values()} == {DONE}
+
+
+def test_workers_drain_the_queue(store):
+    workers = JobWorkers(store, {"m": _doubler}, workers=2, poll_interval_s=0.01)
+    ids = store.submit("m", [{"x": i} for i in range(20)])
+    workers.start()
+    try:
+        deadline = time.monotonic() + 10
+        while store.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        workers.stop()
+    jobs = store.get(ids)
+    assert [jobs[i]["result"] for i in ids] == [{"y": 2 * i} for i in range(20)]
@@ -0,0 +1,74 @@
+# tests/test_legacy_parity.py
+"""
+The /legacy routes must answer like the backend/ml apps they replace:
+same status codes, keys and values (probabilities within ATOL). Error
+details may differ. benchmarks/check_legacy_parity.py runs the same
+comparison on more rows and prints the differences.
+"""
+import pytest
+
+pytest.importorskip("tensorflow")  # the legacy stress app loads its Keras model
+
+from fastapi.testclient import TestClient
+
+import main as server
+from benchmarks.check_legacy_parity import (
+    LEGACY_ROUTINE_APP,
+    LEGACY_STRESS_APP,
+    load_legacy_app,
+    routine_cases,
+    same,
+    stress_cases,
+)
+
+ROWS = 50
+ATOL = 1e-5
+
+CONTRACTS = {
+    # model: (legacy app, legacy path, new path, edge cases)
+    "stress": (LEGACY_STRESS_APP, "/predict", f"{server.LEGACY_STRESS_PREFIX}/predict", stress_cases),
+    "routine": (
+        LEGACY_ROUTINE_APP,
+        "/predict-difficulty",
+        f"{server.LEGACY_ROUTINE_PREFIX}/predict-difficulty",
+        routine_cases,
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def new_client():
+    with TestClient(server.app, raise_server_exceptions=False) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def legacy_clients():
+    return {
+        name: TestClient(load_legacy_app(path, f"legacy_{name}_app"), raise_server_exceptions=False)
+        for name, (path, *_) in CONTRACTS.items()
+    }
+
+
+@pytest.mark.parametrize("model", sorted(CONTRACTS))
+def test_predict_matches_legacy(model, new_client, legacy_clients):
+    _, legacy_path, new_path, cases = CONTRACTS[model]
+    rows = server.registry.get(model).sample_inputs(ROWS)
+    legacy = legacy_clients[model]
+
+    mismatches = []
+    for i, body in enumerate(cases(rows)):
+        old, new = legacy.post(legacy_path, json=body), new_client.post(new_path, json=body)
+        if old.status_code != new.status_code or (old.status_code == 200 and not same(old.json(), new.json(), ATOL)):
+            mismatches.append(f"case {i}: legacy {old.status_code} {old.text[:200]} / new {new.status_code} {new.text[:200]}")
+    assert not mismatches, "\n".join(mismatches)
+
+
+@pytest.mark.parametrize("model, legacy_path, new_path", [
+    ("stress", "/health", f"{server.LEGACY_STRESS_PREFIX}/health"),
+    ("routine", "/health", f"{server.LEGACY_ROUTINE_PREFIX}/health"),
+])
+def test_health_keys_match_legacy(model, legacy_path, new_path, new_client, legacy_clients):
+    old, new = legacy_clients[model].get(legacy_path), new_client.get(new_path)
+    assert old.status_code == new.status_code == 200
+    assert list(old.json()) == list(new.json())
@@ -0,0 +1,119 @@
+# tests/test_model_registry.py
+"""Hot reload: builds are published in order and a failed build keeps the served version."""
+import threading
+import time
+
+import pytest
+
+from services.model_registry import ModelRegistry, fingerprint
+
+
+class ArtifactModel:
+    """Factory whose instance is the artifact text; "bad" fails to load."""
+
+    def __init__(self, path):
+        self.path = path
+        self.builds = 0
+        self.active = 0
+        self.max_active = 0
+        self.slow = None  # artifact text whose build waits for `gate`
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        text = self.path.read_text()
+        with self._lock:
+            self.builds += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if text == "bad":
+                raise ValueError("corrupt artifact")
+            if text == self.slow:
+                self.started.set()
+                self.gate.wait(5)
+            return text
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_text("v1")
+    return path
+
+
+@pytest.fixture
+def model(artifact):
+    return ArtifactModel(artifact)
+
+
+@pytest.fixture
+def registry(artifact, model):
+    reg = ModelRegistry(checksum=True)
+    reg.register("m", model, watch_paths=[artifact])
+    assert reg.get("m") == "v1"
+    return reg
+
+
+def test_concurrent_reloads_publish_the_latest_artifacts(registry, artifact, model):
+    artifact.write_text("v2")
+    model.slow = "v2"
+    first = threading.Thread(target=registry.reload, args=("m",))
+    first.start()
+    assert model.started.wait(5)
+
+    # New artifacts land while the first reload is still building
+    artifact.write_text("v3")
+    second = threading.Thread(target=registry.reload, args=("m",))
+    second.start()
+    time.sleep(0.1)
+    model.gate.set()
+    first.join(5)
+    second.join(5)
+
+    status = registry.model_status("m")
+    assert registry.get("m") == "v3"
+    assert status["fingerprint"] == fingerprint([artifact], checksum=True)
+    assert status["version"] == 3
+    assert model.max_active == 1
+
+
+def test_watcher_skips_artifacts_a_manual_reload_already_loaded(registry, artifact, model):
+    artifact.write_text("v2")
+    assert registry.check_for_updates() == []  # first sighting: wait for writes to settle
+    assert registry.reload("m")
+    builds = model.builds
+    assert registry.check_for_updates() == []
+    assert registry.reload("m", changed_only=True) is False
+    assert model.builds == builds
+
+
+def test_failed_reload_keeps_the_served_version(registry, artifact, model):
+    before = registry.model_status("m")
+    artifact.write_text("bad")
+
+    assert registry.reload("m") is False
+    status = registry.model_status("m")
+    assert registry.get("m") == "v1"
+    assert status["ready"]
+    assert status["version"] == before["version"]
+    assert status["fingerprint"] == before["fingerprint"]
+    assert status["failed_fingerprint"] == fingerprint([artifact], checksum=True)
+    assert "corrupt artifact" in status["reload_error"]
+
+    # The watcher doesn't retry the same broken artifacts on every poll
+    builds = model.builds
+    assert registry.check_for_updates() == []
+    assert registry.check_for_updates() == []
+    assert model.builds == builds
+
+    artifact.write_text("v2")
+    registry.check_for_updates()
+    assert registry.check_for_updates() == ["m"]
+    status = registry.model_status("m")
+    assert registry.get("m") == "v2"
+    assert status["failed_fingerprint"] is None and status["reload_error"] is None
@@ -0,0 +1,115 @@
+# tests/test_prediction_capture.py
+"""PredictionCapture: memory cap, sampling, rotation, and errors kept off the request path."""
+import json
+import random
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from services.prediction_capture import PredictionCapture, parse_sample_rates
+
+
+def _double(items):
+    return [{"y": x["x"] * 2} for x in items]
+
+
+def _read(path):
+    if path.suffix == ".parquet":
+        return pq.read_table(path)
+    with pa.ipc.open_file(str(path)) as reader:
+        return reader.read_all()
+
+
+def test_disabled_returns_the_batch_fn_untouched(tmp_path):
+    capture = PredictionCapture(tmp_path, enabled=False)
+    assert capture.wrap("m", _double) is _double
+
+
+def test_ring_buffer_drops_the_oldest_past_the_cap(tmp_path):
+    capture = PredictionCapture(tmp_path, max_buffer_bytes=2000)
+    for i in range(50):
+        capture.record_batch("m", [{"x": i}], [{"y": i}], 0.001)
+
+    stats = capture.stats()
+    assert 0 < stats["buffered_bytes"] <= 2000
+    assert stats["dropped"] > 0
+    assert stats["buffered"] + stats["dropped"] == stats["captured"] == 50
+
+    # The newest rows are the ones kept
+    capture.flush()
+    capture._close_file()
+    (path,) = tmp_path.glob("predictions-*.parquet")
+    inputs = [json.loads(x) for x in _read(path).column("inputs").to_pylist()]
+    assert inputs[-1] == {"x": 49} and {"x": 0} not in inputs
+
+
+def test_per_model_sample_rates(tmp_path):
+    random.seed(0)
+    capture = PredictionCapture(tmp_path, sample_rate=1.0, sample_rates={"off": 0.0, "half": 0.5})
+    items = [{"x": i} for i in range(1000)]
+    for model in ("off", "half", "all"):
+        capture.record_batch(model, items, _double(items), 0.001)
+
+    counts = {}
+    for entry in capture._buffer:
+        counts[entry[1]] = counts.get(entry[1], 0) + len(entry[5])
+    assert "off" not in counts
+    assert counts["all"] == 1000
+    assert 400 < counts["half"] < 600
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_rotates_files_by_rows(tmp_path, file_format):
+    capture = PredictionCapture(tmp_path, file_format=file_format, rotate_rows=5)
+    run = capture.wrap("m", _double, version=lambda: "v1")
+    for batch in range(4):
+        run([{"x": batch * 3 + i} for i in range(3)])
+        capture.flush()
+    capture._close_file()
+
+    files = sorted(tmp_path.glob(f"predictions-*.{file_format}"))
+    assert not list(tmp_path.glob("*.inprogress"))
+    assert [_read(p).num_rows for p in files] == [6, 6]
+    table = pa.concat_tables([_read(p) for p in files])
+    assert [json.loads(x)["x"] for x in table.column("inputs").to_pylist()] == list(range(12))
+    assert set(table.column("model_version").to_pylist()) == {"v1"}
+    assert set(table.column("batch_size").to_pylist()) == {3}
+    assert capture.stats()["written"] == 12 and capture.stats()["files"] == 2
+
+
+def test_capture_errors_never_reach_the_request_path(tmp_path):
+    def bad_inputs(items):
+        raise RuntimeError("inputs mapper broke")
+
+    capture = PredictionCapture(tmp_path)
+    assert capture.wrap("m", _double, inputs=bad_inputs)([{"x": 1}]) == [{"y": 2}]
+    assert capture.wrap("m", lambda items: [object()])([{"x": 1}])[0] is not None
+    assert capture.stats()["errors"] == 2
+    assert capture.stats()["captured"] == 0
+
+    # Flush into a path that can't be a directory: the rows are dropped, counted
+    blocked = tmp_path / "not-a-dir"
+    blocked.write_text("")
+    capture = PredictionCapture(blocked / "sub")
+    capture.wrap("m", _double)([{"x": 1}, {"x": 2}])
+    assert capture.flush() == 0
+    stats = capture.stats()
+    assert (stats["errors"], stats["dropped"], stats["written"]) == (1, 2, 0)
+    assert "flush" in stats["last_error"]
+
+
+def test_background_thread_flushes_on_stop(tmp_path):
+    capture = PredictionCapture(tmp_path, flush_interval_s=60)
+    capture.start()
+    capture.wrap("m", _double)([{"x": 1}])
+    capture.stop()
+    (path,) = tmp_path.glob("predictions-*.parquet")
+    assert _read(path).num_rows == 1
+
+
+def test_parse_sample_rates_skips_bad_entries():
+    assert parse_sample_rates("stress=1, drawing=0.1,,bad=x") == {"stress": 1.0, "drawing": 0.1}
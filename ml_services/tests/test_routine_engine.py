@@ -0,0 +1,46 @@
+# tests/test_routine_engine.py
+"""The compiled routine trees must predict exactly what LightGBM predicts."""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("lightgbm")
+
+from benchmarks.bench_routine_engine import parity_rows
+from services.routine_difficulty_service import RoutineDifficultyService
+
+ROUTINE_DIR = Path(__file__).resolve().parent.parent / "interactive_visual_task_scheduler"
+
+
+@pytest.fixture(scope="module")
+def service():
+    svc = RoutineDifficultyService(ROUTINE_DIR, engine="numpy")
+    assert svc.compiled is not None, svc.engine_error
+    return svc
+
+
+@pytest.fixture(scope="module")
+def rows(service):
+    return parity_rows(service.compiled, 20000, len(service.current_lookup.classes_))
+
+
+def test_parity_rows_cover_every_level(service, rows):
+    levels = rows[:, 5][~np.isnan(rows[:, 5])]
+    assert set(levels.astype(int)) == set(range(len(service.current_lookup.classes_)))
+
+
+def test_classes_match_lightgbm(service, rows):
+    mismatches = np.flatnonzero(service.compiled.predict(rows) != service.model.predict(rows))
+    assert mismatches.size == 0, f"{mismatches.size} rows differ, first: {rows[mismatches[0]]}"
+
+
+def test_probabilities_match_lightgbm(service, rows):
+    max_diff = float(np.max(np.abs(service.compiled.predict_proba(rows) - service.model.predict_proba(rows))))
+    assert max_diff <= service.PARITY_ATOL
+
+
+def test_service_engines_agree(service):
+    reference = RoutineDifficultyService(ROUTINE_DIR, engine="lightgbm")
+    requests = service.sample_inputs(500)
+    assert service.predict_next_level_batch(requests) == reference.predict_next_level_batch(requests)
@@ -0,0 +1,42 @@
+# tests/test_score_offline.py
+"""Chunked Parquet output keeps one schema when CSV chunks infer different dtypes."""
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from score_offline import ChunkWriter, read_chunks
+
+
+def test_int_column_takes_fractions_in_a_later_chunk(tmp_path):
+    src = tmp_path / "in.csv"
+    src.write_text("childId,minutes\na,1\nb,2\nc,1.5\nd,\n")
+    chunks = list(read_chunks(src, chunk_size=2))
+    assert [str(df["minutes"].dtype) for df in chunks] == ["int64", "float64"]
+
+    out = tmp_path / "out.parquet"
+    writer = ChunkWriter(out)
+    for df in chunks:
+        writer.write(df)
+    writer.close()
+
+    table = pq.read_table(out)
+    assert table.schema.field("minutes").type == pa.float64()
+    assert table.column("minutes").to_pylist() == [1.0, 2.0, 1.5, None]
+    assert writer.rows == 4
+
+
+def test_nullable_int_outputs_keep_their_type(tmp_path):
+    out = tmp_path / "out.parquet"
+    writer = ChunkWriter(out)
+    writer.write(pd.DataFrame({"stress_score": pd.array([1, 2], dtype="Int64"), "error": [None, None]}))
+    writer.write(pd.DataFrame({"stress_score": pd.array([None, 0], dtype="Int64"), "error": [None, "bad row"]}))
+    writer.close()
+
+    table = pq.read_table(out)
+    assert table.schema.field("stress_score").type == pa.int64()
+    assert table.column("stress_score").to_pylist() == [1, 2, None, 0]
+    assert table.column("error").to_pylist() == [None, None, None, "bad row"]